@@ -7,6 +7,8 @@ Main training script for protein-protein interaction prediction using a fully co
 Author: Kiana Seraj
 """
 
+import os
+import sys
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -14,14 +16,41 @@ from torch.optim.lr_scheduler import MultiStepLR
 from tqdm import tqdm
 import numpy as np
 
-from src.metrics import get_accuracy, get_mse
+# Modules in src/ import each other by name (as when run from src/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from src.metrics import MetricAccumulator
 from src.model import FC
-from src.data import train_loader, val_loader
+from src.data import ProtDataset, NegativeSampledDataset, make_loader
 
 
 # Set device
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print("Device:", device)
+
+
+# ========================
+# Data
+# ========================
+# Placeholder paths (replace with real ones)
+train_data_path = "PATH/to/training_dataset.npy"
+val_data_path = "PATH/to/validation_dataset.npy"
+feature_dir = "PATH/to/feature_vectors"
+batch_size = 256
+# Negatives per positive drawn fresh every epoch; None trains on the negatives stored in the pair file
+negative_ratio = None
+# bfloat16 autocast for the forward passes (fastest on CPUs with AVX-512 BF16 / AMX); off by default
+bf16 = False
+
+# Each protein is loaded once into memory; batches are gathered whole and pinned for GPU copies
+train_dataset = ProtDataset(feature_dir, np.load(train_data_path, allow_pickle=True), in_memory=True)
+val_dataset = ProtDataset(feature_dir, np.load(val_data_path, allow_pickle=True), in_memory=True, vocab=train_dataset.vocab)
+if negative_ratio is not None:
+    # Validation positives are excluded too, so they are never sampled as training negatives
+    val_positives = np.stack([val_dataset.prot_1, val_dataset.prot_2], axis=1)[val_dataset.labels == 1]
+    train_dataset = NegativeSampledDataset(train_dataset, negative_ratio, seed=0, known_positives=val_positives)
+train_loader = make_loader(train_dataset, batch_size, shuffle=True, pin_memory=device.type == "cuda")
+val_loader = make_loader(val_dataset, batch_size, shuffle=False, pin_memory=device.type == "cuda")
 print("Data size:", len(train_loader), "train batches,", len(val_loader), "val batches")
 
 
@@ -30,29 +59,29 @@ print("Data size:", len(train_loader), "train batches,", len(val_loader), "val b
 # ========================
 def training(model, train_loader, device, optimizer, scheduler):
     model.train()
-    loss_func = nn.BCELoss()
-    predictions_tr = torch.Tensor()
-    labels_tr = torch.Tensor()
+    # Sigmoid fused into the loss: the model outputs one class-1 logit per pair
+    loss_func = nn.BCEWithLogitsLoss()
+    # Scores, labels and loss stay on the device until the end of the epoch
+    accumulator = MetricAccumulator(len(train_loader.dataset), device)
 
     for prot1, prot2, label in train_loader:
-        prot1, prot2, label = prot1.to(device), prot2.to(device), label.view(-1, 1).float().to(device)
+        prot1, prot2 = prot1.to(device, non_blocking=True), prot2.to(device, non_blocking=True)
+        label = label.view(-1, 1).float().to(device, non_blocking=True)
 
         optimizer.zero_grad()
-        output = model(prot1, prot2)[:, 1].unsqueeze(1)  # Get probability of class 1
+        with torch.autocast(device.type, dtype=torch.bfloat16, enabled=bf16):
+            logits = model.logits(prot1, prot2).unsqueeze(1)  # Class-1 logit, fp32
 
-        loss = loss_func(output, label)
+        loss = loss_func(logits, label)
         loss.backward()
         optimizer.step()
-
-        predictions_tr = torch.cat((predictions_tr, output.cpu()), 0)
-        labels_tr = torch.cat((labels_tr, label.cpu()), 0)
+        accumulator.update(torch.sigmoid(logits), label, loss)  # Probability of class 1
 
     scheduler.step()
 
-    labels_tr = labels_tr.detach().numpy()
-    predictions_tr = predictions_tr.detach().numpy()
-    acc_tr = get_accuracy(labels_tr, predictions_tr, 0.5)
-    print(f"[Train] Loss: {loss.item():.4f} | Accuracy: {acc_tr:.2f}%")
+    metrics_tr = accumulator.compute(0.5)
+    print(f"[Train] Loss: {metrics_tr['loss']:.4f} | Accuracy: {100 * metrics_tr['accuracy']:.2f}% | "
+          f"MCC: {metrics_tr['mcc']:.4f} | AUROC: {metrics_tr['auroc']:.4f}")
 
 
 # ========================
@@ -60,23 +89,25 @@ def training(model, train_loader, device, optimizer, scheduler):
 # ========================
 def validation(model, val_loader, device):
     model.eval()
-    predictions = torch.Tensor()
-    labels = torch.Tensor()
+    loss_func = nn.BCEWithLogitsLoss()
+    accumulator = MetricAccumulator(len(val_loader.dataset), device)
 
     with torch.no_grad():
         for prot1, prot2, label in val_loader:
-            prot1, prot2 = prot1.to(device), prot2.to(device)
-            output = model(prot1, prot2)[:, 1].unsqueeze(1)  # Take probability for class 1
-            predictions = torch.cat((predictions, output.cpu()), 0)
-            labels = torch.cat((labels, label.view(-1,1).cpu()), 0)
+            prot1, prot2 = prot1.to(device, non_blocking=True), prot2.to(device, non_blocking=True)
+            label = label.float().to(device, non_blocking=True)
+            with torch.autocast(device.type, dtype=torch.bfloat16, enabled=bf16):
+                logits = model.logits(prot1, prot2)
+            # Same BCE-with-logits loss as in training, so both epoch lines are comparable
+            accumulator.update(torch.sigmoid(logits), label, loss_func(logits, label))  # Probability of class 1
 
-    return labels.numpy(), predictions.numpy()
+    return accumulator.compute(0.5)
 
 
 # ========================
 # Main Training Loop
 # ========================
-model = FC().to(device)
+model = FC(single_logit=True).to(device)
 optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
 scheduler = MultiStepLR(optimizer, milestones=[1, 5], gamma=0.5)
 
@@ -84,10 +115,10 @@ num_epochs = 30
 
 for epoch in range(num_epochs):
     print(f"\n=== Epoch {epoch+1}/{num_epochs} ===")
+    if negative_ratio is not None:
+        train_dataset.set_epoch(epoch)
     training(model, train_loader, device, optimizer, scheduler)
 
-    labels, predictions = validation(model, val_loader, device)
-    acc = get_accuracy(labels, predictions, 0.5)
-    loss = get_mse(labels, predictions)
-
-    print(f"[Validation] Loss: {loss:.4f} | Accuracy: {acc:.2f}%")
+    metrics = validation(model, val_loader, device)
+    print(f"[Validation] Loss: {metrics['loss']:.4f} | Accuracy: {100 * metrics['accuracy']:.2f}% | "
+          f"MCC: {metrics['mcc']:.4f} | AUROC: {metrics['auroc']:.4f}")
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark.py
+
+Benchmark suite for the feature descriptors in utils.py and feature_generator.py.
+
+- Synthetic proteins from 30 to 35,000 residues (UniProt background residue frequencies)
+  plus a UniProt-like length mix
+- Timings of AAC, DPC, CTD (whole, and per property with the string descriptors), QSOrder, SOCNumber, APAAC and the
+  full pipeline, reported as per-length scaling curves
+- Correctness cross-check of the fast implementations against the reference ones
+
+Run using: python benchmark.py [--lengths 30 300 3000] [--json results.json]
+
+Author: Kiana Seraj
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+import numpy as np
+import protpy
+
+import constants
+from constants import grantham_distances, schneider_wrede_distances, schneider_wrede_order
+from feature_generator import APAAC, CTD, compute_QSOrder, compute_SOCNumber, protein_features
+from utils import (
+    AAC, DPC, AAC_batch, DPC_batch, SEQUENCE_ORDER_AA, ctd_descriptor, physiochemical_properties,
+    composition_descriptor, distribution_descriptor, transition_descriptor,
+    quasi_sequence_order, sequence_order_coupling_number
+)
+
+# UniProtKB/Swiss-Prot residue frequencies (%)
+BACKGROUND_FREQUENCIES = {
+    "A": 8.25, "R": 5.53, "N": 4.06, "D": 5.45, "C": 1.37, "Q": 3.93, "E": 6.75,
+    "G": 7.07, "H": 2.27, "I": 5.96, "L": 9.66, "K": 5.84, "M": 2.42, "F": 3.86,
+    "P": 4.70, "S": 6.56, "T": 5.34, "W": 1.08, "Y": 2.92, "V": 6.87
+}
+
+DEFAULT_LENGTHS = [30, 100, 300, 1000, 3000, 10000, 35000]
+
+# Name of each physicochemical property, in CTD order
+PROPERTY_NAMES = [
+    next(name for name, value in vars(constants).items() if value is prop)
+    for prop in constants.physiochemical_classes
+]
+
+
+# =========================
+# Synthetic Proteins
+# =========================
+
+def synthetic_sequence(length, rng):
+    """
+    Random protein of `length` residues drawn from the UniProt background frequencies.
+    """
+    residues = list(BACKGROUND_FREQUENCIES)
+    weights = list(BACKGROUND_FREQUENCIES.values())
+    return "".join(rng.choices(residues, weights=weights, k=length))
+
+
+def uniprot_like_lengths(n, rng, min_length=31, max_length=35000):
+    """
+    Protein lengths following a log-normal fit of UniProt (median ~300 residues, long tail).
+    """
+    return [min(max(int(rng.lognormvariate(math.log(300), 0.75)), min_length), max_length) for _ in range(n)]
+
+
+# =========================
+# Reference Implementations
+# =========================
+
+def reference_aac(sequence):
+    """
+    Original per-sequence AAC through protpy.
+    """
+    return [i / 100 for i in protpy.amino_acid_composition(sequence).values[0]]
+
+
+def reference_dpc(sequence):
+    """
+    Original per-sequence DPC through protpy.
+    """
+    return [i / 100 for i in protpy.dipeptide_composition(sequence).values[0]]
+
+
+def reference_transition(encoding):
+    """
+    Original sliding-window transition descriptor.
+    """
+    transitions_ = {}
+    transitions = ["12", "13", "21", "23", "31", "32"]
+    for i in range(len(encoding) - 1):
+        transition = encoding[i:i+2]
+        if transition in transitions:
+            transitions_[transition] = transitions_.get(transition, 0) + 1
+
+    combined = {"12": 0, "13": 0, "23": 0}
+    for t, count in transitions_.items():
+        if t in ["12", "21"]: combined["12"] += count
+        elif t in ["13", "31"]: combined["13"] += count
+        else: combined["23"] += count
+
+    denom = len(encoding) - 1 if len(encoding) > 1 else 1
+    return [combined["12"]/denom, combined["13"]/denom, combined["23"]/denom]
+
+
+def reference_distribution(encoding):
+    """
+    Original list-of-positions distribution descriptor.
+    """
+    features = []
+    for c in ["1", "2", "3"]:
+        positions = [i for i, char in enumerate(encoding) if char == c]
+        n = len(positions)
+        raw = [0] * 5 if not positions else [
+            positions[0]+1,
+            positions[min(math.ceil(n*0.25)-1, n-1)]+1,
+            positions[min(math.ceil(n*0.50)-1, n-1)]+1,
+            positions[min(math.ceil(n*0.75)-1, n-1)]+1,
+            positions[-1]+1
+        ]
+        features.extend([r / len(encoding) for r in raw])
+    return features
+
+
+def reference_ctd(sequence):
+    """
+    CTD through the string encodings, one property at a time (original implementation).
+    """
+    ctd = []
+    for descriptor in physiochemical_properties:
+        encoding = descriptor(sequence)
+        ctd.extend(composition_descriptor(encoding))
+        ctd.extend(reference_distribution(encoding))
+        ctd.extend(reference_transition(encoding))
+    return ctd
+
+
+def reference_sequence_order(sequence, nlag=30, weight=0.1):
+    """
+    QSOrder and SOCNumber with the pure-Python loops of iFeature (protFeat).
+
+    Returns:
+        tuple: (QSOrder list, SOCNumber list)
+    """
+    def schneider(a, b):
+        return schneider_wrede_distances[a][schneider_wrede_order.index(b)]
+
+    def grantham(a, b):
+        return 0 if a == b else grantham_distances[tuple(sorted((a, b)))]
+
+    taus = []
+    for dist in (schneider, grantham):
+        taus.append([
+            sum(dist(sequence[j], sequence[j + n]) ** 2 for j in range(len(sequence) - n))
+            for n in range(1, nlag + 1)
+        ])
+    qso = []
+    for tau in taus:
+        qso += [sequence.count(aa) / (1 + weight * sum(tau)) for aa in SEQUENCE_ORDER_AA]
+    for tau in taus:
+        qso += [weight * t / (1 + weight * sum(tau)) for t in tau]
+    soc = [tau[n - 1] / (len(sequence) - n) for tau in taus for n in range(1, nlag + 1)]
+    return qso, soc
+
+
+def cross_check(sequences, rel_tol=1e-12):
+    """
+    Check every fast implementation against its reference on `sequences`.
+
+    CTD and AAC/DPC must match exactly; QSOrder/SOCNumber within `rel_tol`
+    (NumPy sums in a different order than the Python loops).
+
+    Raises:
+        AssertionError: On the first mismatch.
+    """
+    for sequence in sequences:
+        assert ctd_descriptor(sequence) == reference_ctd(sequence), f"CTD mismatch (length {len(sequence)})"
+        for descriptor in physiochemical_properties:
+            encoding = descriptor(sequence)
+            assert distribution_descriptor(encoding) == reference_distribution(encoding), "Distribution mismatch"
+            assert transition_descriptor(encoding) == reference_transition(encoding), "Transition mismatch"
+        if len(sequence) > 30:
+            qso, soc = reference_sequence_order(sequence)
+            assert np.allclose(quasi_sequence_order(sequence), qso, rtol=rel_tol, atol=0), "QSOrder mismatch"
+            assert np.allclose(sequence_order_coupling_number(sequence), soc, rtol=rel_tol, atol=0), "SOCNumber mismatch"
+    assert (AAC_batch(sequences) == np.array([reference_aac(s) for s in sequences])).all(), "AAC mismatch"
+    assert (DPC_batch(sequences) == np.array([reference_dpc(s) for s in sequences])).all(), "DPC mismatch"
+
+
+# =========================
+# Timing
+# =========================
+
+def time_call(fn, min_seconds=0.2, max_repeats=50):
+    """
+    Best wall time (seconds) of `fn()` over repeats lasting at least `min_seconds`.
+    """
+    best, elapsed, repeats = math.inf, 0.0, 0
+    while repeats < 1 or (elapsed < min_seconds and repeats < max_repeats):
+        start = time.perf_counter()
+        fn()
+        duration = time.perf_counter() - start
+        best = min(best, duration)
+        elapsed += duration
+        repeats += 1
+    return best
+
+
+def benchmark_sequence(sequence, per_property=True, reference=True, min_seconds=0.2):
+    """
+    Time every descriptor stage on one sequence.
+
+    Stages that reject the sequence (sequence-order descriptors and APAAC on sequences
+    not longer than their lag) are reported as NaN.
+
+    Returns:
+        dict: stage -> milliseconds per call
+    """
+    stages = {
+        "AAC": lambda: AAC(sequence),
+        "DPC": lambda: DPC(sequence),
+        "CTD": lambda: CTD(sequence),
+        "QSOrder": lambda: compute_QSOrder(sequence),
+        "SOCNumber": lambda: compute_SOCNumber(sequence),
+        "APAAC": lambda: APAAC(sequence),
+        "pipeline": lambda: protein_features(sequence, "benchmark"),
+    }
+    if reference:
+        stages["CTD_reference"] = lambda: reference_ctd(sequence)
+        stages["AAC_reference"] = lambda: reference_aac(sequence)
+        stages["DPC_reference"] = lambda: reference_dpc(sequence)
+    if per_property:
+        for descriptor, name in zip(physiochemical_properties, PROPERTY_NAMES):
+            stages[f"CTD_property/{name}"] = lambda d=descriptor: (
+                lambda e: (composition_descriptor(e), distribution_descriptor(e), transition_descriptor(e))
+            )(d(sequence))
+    timings = {}
+    for stage, fn in stages.items():
+        try:
+            timings[stage] = 1000 * time_call(fn, min_seconds)
+        except (ValueError, ZeroDivisionError):
+            timings[stage] = math.nan
+    return timings
+
+
+def scaling_exponents(lengths, timings):
+    """
+    Log-log slope of time vs length per stage (1 = linear scaling), fitted on the
+    lengths where the stage ran.
+    """
+    exponents = {}
+    for stage in timings[0]:
+        points = [(length, t[stage]) for length, t in zip(lengths, timings) if not math.isnan(t[stage])]
+        if len(points) > 1:
+            x, y = np.log(points).T
+            exponents[stage] = float(np.polyfit(x, y, 1)[0])
+    return exponents
+
+
+def run(lengths=DEFAULT_LENGTHS, mix_size=200, seed=0, per_property=True, reference=True,
+        min_seconds=0.2, check=True):
+    """
+    Run the whole benchmark suite.
+
+    Returns:
+        dict: Per-length timings, scaling exponents and UniProt-mix throughput.
+    """
+    rng = random.Random(seed)
+    sequences = {length: synthetic_sequence(length, rng) for length in lengths}
+    mix = [synthetic_sequence(length, rng) for length in uniprot_like_lengths(mix_size, rng)]
+
+    if check:
+        cross_check([s for s in sequences.values() if len(s) <= 3000] + mix[:50])
+        print("[Check] fast implementations match the reference output")
+
+    timings = []
+    for length in lengths:
+        timings.append(benchmark_sequence(sequences[length], per_property, reference, min_seconds))
+        print(f"[Length {length:>6}] " + " | ".join(
+            f"{stage} {ms:.2f} ms" for stage, ms in timings[-1].items() if "/" not in stage))
+
+    start = time.perf_counter()
+    for sequence in mix:
+        protein_features(sequence, "benchmark")
+    mix_seconds = time.perf_counter() - start
+    mix_residues = sum(len(s) for s in mix)
+    print(f"[UniProt mix] {len(mix) / mix_seconds:.1f} seq/s, {mix_residues / mix_seconds:.0f} residues/s")
+
+    return {
+        "lengths": list(lengths),
+        "timings_ms": timings,
+        "scaling_exponents": scaling_exponents(lengths, timings),
+        "uniprot_mix": {
+            "sequences": len(mix),
+            "residues": mix_residues,
+            "sequences_per_second": len(mix) / mix_seconds,
+            "residues_per_second": mix_residues / mix_seconds,
+        },
+    }
+
+
+# =========================
+# Main
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DeepPPI feature descriptors")
+    parser.add_argument("--lengths", type=int, nargs="+", default=DEFAULT_LENGTHS)
+    parser.add_argument("--mix-size", type=int, default=200, help="Number of UniProt-like proteins")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum timing budget per stage")
+    parser.add_argument("--no-per-property", action="store_true", help="Skip per-property CTD timings")
+    parser.add_argument("--no-reference", action="store_true", help="Skip reference implementations")
+    parser.add_argument("--no-check", action="store_true", help="Skip the correctness cross-check")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.lengths, args.mix_size, args.seed, not args.no_per_property,
+                  not args.no_reference, args.min_seconds, not args.no_check)
+    print("\nScaling exponents (time ~ length^k):")
+    for stage, k in results["scaling_exponents"].items():
+        print(f"  {stage:<45} {k:.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
@@ -1,14 +1,14 @@
 """
 constants.py
 
-Contains amino acid class dictionaries and physiochemical property descriptor lists
-used for encoding protein sequences in DeepPPI-style neural network models.
+Contains amino acid class dictionaries, their ordered list used for CTD encoding,
+and the Grantham / Schneider-Wrede distance tables used for encoding protein sequences in DeepPPI-style
+neural network models.
+Also defines the feature vector blocks and the helpers resolving a feature set to them.
 
 Author: Kiana Seraj
 """
 
-from utils import *
-
 # ============================== #
 # Amino Acid Groupings by Property
 # ============================== #
@@ -182,34 +182,34 @@ Amino_acid_flexibility = {
 }
 
 # ============================== #
-# List of Physiochemical Descriptors (functions from utils.py)
+# List of Physiochemical Class Groupings (CTD order)
 # ============================== #
 
-physiochemical_properties = [
-    hydrophobicity_descriptor,
-    Normalized_van_der_waals_vol_descriptor,
-    polarity_descriptor,
-    polarizability_descriptor,
-    charge_descriptor,
-    secondary_structure_descriptor,
-    solvent_accessible_descriptor,
-    surface_tension_descriptor,
-    prot_prot_hotspot_descriptor,
-    prot_prot_propensity_descriptor,
-    prot_dna_propensity_Schneider_descriptor,
-    prot_dna_propensity_Ahmad_descriptor,
-    prot_RNA_propensity_Kim_descriptor,
-    prot_RNA_propensity_Ellis_descriptor,
-    prot_RNA_propensity_Phipps_descriptor,
-    prot_ligand_propensity_descriptor,
-    prot_ligand_valid_propensity_descriptor,
-    prot_ligand_polar_propensity_descriptor,
-    molecular_weight_descriptor,
-    cLogP_descriptor,
-    hydrogen_bond_donor_descriptor,
-    hydrogen_bond_acceptor_descriptor,
-    water_Solubility_descriptor,
-    Amino_acid_flexibility_descriptor  
+physiochemical_classes = [
+    hydrophobicity,
+    Normalized_van_der_waals_vol,
+    polarity,
+    polarizability,
+    charge,
+    secondary_structure,
+    solvent_accessible,
+    surface_tension,
+    prot_prot_hotspot,
+    prot_prot_propensity,
+    prot_dna_propensity_Schneider,
+    prot_dna_propensity_Ahmad,
+    prot_RNA_propensity_Kim,
+    prot_RNA_propensity_Ellis,
+    prot_RNA_propensity_Phipps,
+    prot_ligand_propensity,
+    prot_ligand_valid_propensity,
+    prot_ligand_polar_propensity,
+    molecular_weight,
+    cLogP,
+    hydrogen_bond_donor,
+    hydrogen_bond_acceptor,
+    water_Solubility,
+    Amino_acid_flexibility
 ]
 
 # ============================== #
@@ -221,7 +221,149 @@ physiochemical_properties = [
 # Only upper triangular entries stored to avoid redundancy
 grantham_distances = {
     ('A', 'C'): 195, ('A', 'D'): 126, ('A', 'E'): 107, ('A', 'F'): 113, ('A', 'G'): 60,
-    ...
+    ('A', 'H'): 86, ('A', 'I'): 94, ('A', 'K'): 106, ('A', 'L'): 96, ('A', 'M'): 84,
+    ('A', 'N'): 111, ('A', 'P'): 27, ('A', 'Q'): 91, ('A', 'R'): 112, ('A', 'S'): 99,
+    ('A', 'T'): 58, ('A', 'V'): 64, ('A', 'W'): 148, ('A', 'Y'): 112,
+    ('C', 'D'): 154, ('C', 'E'): 170, ('C', 'F'): 205, ('C', 'G'): 159, ('C', 'H'): 174,
+    ('C', 'I'): 198, ('C', 'K'): 202, ('C', 'L'): 198, ('C', 'M'): 196, ('C', 'N'): 139,
+    ('C', 'P'): 169, ('C', 'Q'): 154, ('C', 'R'): 180, ('C', 'S'): 112, ('C', 'T'): 149,
+    ('C', 'V'): 192, ('C', 'W'): 215, ('C', 'Y'): 194,
+    ('D', 'E'): 45, ('D', 'F'): 177, ('D', 'G'): 94, ('D', 'H'): 81, ('D', 'I'): 168,
+    ('D', 'K'): 101, ('D', 'L'): 172, ('D', 'M'): 160, ('D', 'N'): 23, ('D', 'P'): 108,
+    ('D', 'Q'): 61, ('D', 'R'): 96, ('D', 'S'): 65, ('D', 'T'): 85, ('D', 'V'): 152,
+    ('D', 'W'): 181, ('D', 'Y'): 160,
+    ('E', 'F'): 140, ('E', 'G'): 98, ('E', 'H'): 40, ('E', 'I'): 134, ('E', 'K'): 56,
+    ('E', 'L'): 138, ('E', 'M'): 126, ('E', 'N'): 42, ('E', 'P'): 93, ('E', 'Q'): 29,
+    ('E', 'R'): 54, ('E', 'S'): 80, ('E', 'T'): 65, ('E', 'V'): 121, ('E', 'W'): 152,
+    ('E', 'Y'): 122,
+    ('F', 'G'): 153, ('F', 'H'): 100, ('F', 'I'): 21, ('F', 'K'): 102, ('F', 'L'): 22,
+    ('F', 'M'): 28, ('F', 'N'): 158, ('F', 'P'): 114, ('F', 'Q'): 116, ('F', 'R'): 97,
+    ('F', 'S'): 155, ('F', 'T'): 103, ('F', 'V'): 50, ('F', 'W'): 40, ('F', 'Y'): 22,
+    ('G', 'H'): 98, ('G', 'I'): 135, ('G', 'K'): 127, ('G', 'L'): 138, ('G', 'M'): 127,
+    ('G', 'N'): 80, ('G', 'P'): 42, ('G', 'Q'): 87, ('G', 'R'): 125, ('G', 'S'): 56,
+    ('G', 'T'): 59, ('G', 'V'): 109, ('G', 'W'): 184, ('G', 'Y'): 147,
+    ('H', 'I'): 94, ('H', 'K'): 32, ('H', 'L'): 99, ('H', 'M'): 87, ('H', 'N'): 68,
+    ('H', 'P'): 77, ('H', 'Q'): 24, ('H', 'R'): 29, ('H', 'S'): 89, ('H', 'T'): 47,
+    ('H', 'V'): 84, ('H', 'W'): 115, ('H', 'Y'): 83,
+    ('I', 'K'): 102, ('I', 'L'): 5, ('I', 'M'): 10, ('I', 'N'): 149, ('I', 'P'): 95,
+    ('I', 'Q'): 109, ('I', 'R'): 97, ('I', 'S'): 142, ('I', 'T'): 89, ('I', 'V'): 29,
+    ('I', 'W'): 61, ('I', 'Y'): 33,
+    ('K', 'L'): 107, ('K', 'M'): 95, ('K', 'N'): 94, ('K', 'P'): 103, ('K', 'Q'): 53,
+    ('K', 'R'): 26, ('K', 'S'): 121, ('K', 'T'): 78, ('K', 'V'): 97, ('K', 'W'): 110,
+    ('K', 'Y'): 85,
+    ('L', 'M'): 15, ('L', 'N'): 153, ('L', 'P'): 98, ('L', 'Q'): 113, ('L', 'R'): 102,
+    ('L', 'S'): 145, ('L', 'T'): 92, ('L', 'V'): 32, ('L', 'W'): 61, ('L', 'Y'): 36,
+    ('M', 'N'): 142, ('M', 'P'): 87, ('M', 'Q'): 101, ('M', 'R'): 91, ('M', 'S'): 135,
+    ('M', 'T'): 81, ('M', 'V'): 21, ('M', 'W'): 67, ('M', 'Y'): 36,
+    ('N', 'P'): 91, ('N', 'Q'): 46, ('N', 'R'): 86, ('N', 'S'): 46, ('N', 'T'): 65,
+    ('N', 'V'): 133, ('N', 'W'): 174, ('N', 'Y'): 143,
+    ('P', 'Q'): 76, ('P', 'R'): 103, ('P', 'S'): 74, ('P', 'T'): 38, ('P', 'V'): 68,
+    ('P', 'W'): 147, ('P', 'Y'): 110,
+    ('Q', 'R'): 43, ('Q', 'S'): 68, ('Q', 'T'): 42, ('Q', 'V'): 96, ('Q', 'W'): 130,
+    ('Q', 'Y'): 99,
+    ('R', 'S'): 110, ('R', 'T'): 71, ('R', 'V'): 96, ('R', 'W'): 101, ('R', 'Y'): 77,
+    ('S', 'T'): 58, ('S', 'V'): 124, ('S', 'W'): 177, ('S', 'Y'): 144,
+    ('T', 'V'): 69, ('T', 'W'): 128, ('T', 'Y'): 92,
     ('V', 'W'): 88, ('V', 'Y'): 55,
     ('W', 'Y'): 37
 }
+
+
+# ============================== #
+# Schneider-Wrede Distance Matrix
+# ============================== #
+
+# Physicochemical distance between amino acid pairs (asymmetric: row = first residue)
+# Source: Schneider G. & Wrede P. Biophys J. (1994)
+# Columns follow `schneider_wrede_order`
+schneider_wrede_order = "ACDEFGHIKLMNPQRSTVWY"
+schneider_wrede_distances = {
+    "A": [0.0, 0.112, 0.819, 0.827, 0.54, 0.208, 0.696, 0.407, 0.891, 0.406,
+          0.379, 0.318, 0.191, 0.372, 1.0, 0.094, 0.22, 0.273, 0.739, 0.552],
+    "C": [0.114, 0.0, 0.847, 0.838, 0.437, 0.32, 0.66, 0.304, 0.887, 0.301,
+          0.277, 0.324, 0.157, 0.341, 1.0, 0.176, 0.233, 0.167, 0.639, 0.457],
+    "D": [0.729, 0.742, 0.0, 0.124, 0.924, 0.697, 0.435, 0.847, 0.249, 0.841,
+          0.819, 0.56, 0.657, 0.584, 0.295, 0.667, 0.649, 0.797, 1.0, 0.836],
+    "E": [0.79, 0.788, 0.133, 0.0, 0.932, 0.779, 0.406, 0.86, 0.143, 0.854,
+          0.83, 0.599, 0.688, 0.598, 0.234, 0.726, 0.682, 0.824, 1.0, 0.837],
+    "F": [0.508, 0.405, 0.977, 0.918, 0.0, 0.69, 0.663, 0.128, 0.903, 0.131,
+          0.169, 0.541, 0.42, 0.459, 1.0, 0.548, 0.499, 0.252, 0.207, 0.179],
+    "G": [0.206, 0.312, 0.776, 0.807, 0.727, 0.0, 0.769, 0.592, 0.894, 0.591,
+          0.557, 0.381, 0.323, 0.467, 1.0, 0.158, 0.272, 0.464, 0.923, 0.728],
+    "H": [0.896, 0.836, 0.629, 0.547, 0.907, 1.0, 0.0, 0.848, 0.566, 0.842,
+          0.825, 0.754, 0.777, 0.716, 0.697, 0.865, 0.834, 0.831, 0.981, 0.821],
+    "I": [0.403, 0.296, 0.942, 0.891, 0.134, 0.592, 0.652, 0.0, 0.892, 0.013,
+          0.057, 0.457, 0.311, 0.383, 1.0, 0.443, 0.396, 0.133, 0.339, 0.213],
+    "K": [0.889, 0.871, 0.279, 0.149, 0.957, 0.9, 0.438, 0.899, 0.0, 0.892,
+          0.871, 0.667, 0.757, 0.639, 0.154, 0.825, 0.759, 0.882, 1.0, 0.848],
+    "L": [0.405, 0.296, 0.944, 0.892, 0.139, 0.596, 0.653, 0.013, 0.893, 0.0,
+          0.062, 0.452, 0.309, 0.376, 1.0, 0.443, 0.397, 0.133, 0.341, 0.205],
+    "M": [0.383, 0.276, 0.932, 0.879, 0.182, 0.569, 0.648, 0.058, 0.884, 0.062,
+          0.0, 0.447, 0.285, 0.372, 1.0, 0.417, 0.358, 0.12, 0.391, 0.255],
+    "N": [0.424, 0.425, 0.838, 0.835, 0.766, 0.512, 0.78, 0.615, 0.891, 0.603,
+          0.588, 0.0, 0.266, 0.175, 1.0, 0.361, 0.368, 0.503, 0.945, 0.641],
+    "P": [0.22, 0.179, 0.852, 0.831, 0.515, 0.376, 0.696, 0.363, 0.875, 0.357,
+          0.326, 0.231, 0.0, 0.228, 1.0, 0.196, 0.161, 0.244, 0.72, 0.481],
+    "Q": [0.512, 0.462, 0.903, 0.861, 0.671, 0.648, 0.765, 0.532, 0.881, 0.518,
+          0.505, 0.181, 0.272, 0.0, 1.0, 0.461, 0.389, 0.464, 0.831, 0.522],
+    "R": [0.919, 0.905, 0.305, 0.225, 0.977, 0.928, 0.498, 0.929, 0.141, 0.92,
+          0.908, 0.69, 0.796, 0.668, 0.0, 0.86, 0.808, 0.914, 1.0, 0.859],
+    "S": [0.1, 0.185, 0.801, 0.812, 0.622, 0.17, 0.718, 0.478, 0.883, 0.474,
+          0.44, 0.289, 0.181, 0.358, 1.0, 0.0, 0.174, 0.342, 0.827, 0.615],
+    "T": [0.251, 0.261, 0.83, 0.812, 0.604, 0.312, 0.737, 0.455, 0.866, 0.453,
+          0.403, 0.315, 0.159, 0.322, 1.0, 0.185, 0.0, 0.345, 0.816, 0.596],
+    "V": [0.275, 0.165, 0.9, 0.867, 0.269, 0.471, 0.649, 0.135, 0.889, 0.134,
+          0.12, 0.38, 0.212, 0.339, 1.0, 0.322, 0.305, 0.0, 0.472, 0.31],
+    "W": [0.658, 0.56, 1.0, 0.931, 0.196, 0.829, 0.678, 0.305, 0.892, 0.304,
+          0.344, 0.631, 0.555, 0.538, 0.968, 0.689, 0.638, 0.418, 0.0, 0.204],
+    "Y": [0.587, 0.478, 1.0, 0.932, 0.202, 0.782, 0.678, 0.23, 0.904, 0.219,
+          0.268, 0.512, 0.444, 0.404, 0.995, 0.612, 0.557, 0.328, 0.244, 0.0]
+}
+
+# ============================== #
+# Feature Blocks (in feature vector order)
+# ============================== #
+
+# Name -> dimension of each descriptor block of the 1164-dim protein feature vector
+FEATURE_BLOCKS = {
+    "aac": 20,
+    "dpc": 400,
+    "ctd": 504,
+    "qsorder": 100,
+    "soc_schneider": 30,
+    "soc_grantham": 30,
+    "apaac": 80
+}
+
+
+def resolve_feature_set(feature_set=None):
+    """
+    Turn a feature-set spec into the ordered list of blocks to compute.
+
+    Args:
+        feature_set (iterable or None): Block names from `FEATURE_BLOCKS` (e.g. {"aac", "ctd", "apaac"});
+            "soc" selects both SOC blocks. None selects every block.
+
+    Returns:
+        list: Block names in feature vector order.
+    """
+    if feature_set is None:
+        return list(FEATURE_BLOCKS)
+    requested = set(feature_set)
+    if "soc" in requested:
+        requested = (requested - {"soc"}) | {"soc_schneider", "soc_grantham"}
+    unknown = requested - set(FEATURE_BLOCKS)
+    if unknown:
+        raise ValueError(f"Unknown feature blocks {sorted(unknown)}, expected any of {list(FEATURE_BLOCKS)}")
+    return [block for block in FEATURE_BLOCKS if block in requested]
+
+
+def feature_block_offsets(feature_set=None):
+    """
+    Block name -> [start, end) column range in the vector of a feature set.
+    """
+    offsets, start = {}, 0
+    for block in resolve_feature_set(feature_set):
+        offsets[block] = [start, start + FEATURE_BLOCKS[block]]
+        start += FEATURE_BLOCKS[block]
+    return offsets
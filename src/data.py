@@ -3,7 +3,9 @@
 data.py
 
 Creates a PyTorch Dataset and DataLoader for protein-protein interaction (PPI) modeling.
-Each protein is represented by a precomputed feature vector stored as a `.pt` tensor.
+Each protein is represented by a precomputed feature vector, stored either as a `.pt` file
+per protein or as a row of a memory-mapped feature store (see feature_store.py).
+Pair sets larger than memory are streamed from shards by `ShardedPairDataset`.
 
 Author: Kiana Seraj
 """
@@ -11,7 +13,11 @@ Author: Kiana Seraj
 import os
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import (
+    Dataset, IterableDataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler, get_worker_info
+)
+from feature_store import FeatureStore
+from pairs import ProteinVocab, encode_pairs, is_compact
 
 # =========================
 # Dataset Class
@@ -23,32 +29,136 @@ class ProtDataset(Dataset):
 
     Each row in the input data file should contain:
         [protein_id_1, protein_id_2, label]
-    The corresponding features must exist in `feature_dir` as:
+    or the data file is a compact `PAIR_DTYPE` pair table with its vocabulary (see pairs.py).
+    The corresponding features must exist in `feature_dir` either as:
         protein_id.pt
+    or as rows of a feature store written with `output_format="store"`.
+
+    Pairs are held as int32 protein codes and int8 labels; string pair arrays are encoded
+    once at construction, so no string or path work happens per sample.
+
+    With `in_memory=True`, every protein referenced by the pairs is loaded exactly once
+    into a single (num_proteins, dim) tensor and each pair is mapped to two integer row
+    IDs, so hub proteins are not reloaded for every pair they appear in and whole
+    batches can be gathered with `get_batch`.
 
     Args:
-        feature_dir (str): Directory with protein feature .pt files.
-        data_file (np.array): Array with protein pairs and labels.
+        feature_dir (str): Directory with protein feature .pt files, or a feature store.
+        data_file (np.array): Array with protein pairs and labels, or a compact pair table.
+        in_memory (bool): Load the deduplicated protein table into memory.
+        vocab (ProteinVocab or None): Vocabulary of a compact pair table (required for one).
     """
 
-    def __init__(self, feature_dir: str, data_file: np.ndarray):
+    def __init__(self, feature_dir: str, data_file: np.ndarray, in_memory: bool = False, vocab: ProteinVocab = None):
         self.feature_dir = feature_dir
-        self.prot_1 = data_file[:, 0]
-        self.prot_2 = data_file[:, 1]
-        self.labels = data_file[:, 2].astype(float).astype(int)
+        self.store = FeatureStore(feature_dir) if FeatureStore.is_store(feature_dir) else None
+        if is_compact(data_file):
+            if vocab is None:
+                raise ValueError("A compact pair table requires its ProteinVocab")
+        else:
+            vocab = vocab if vocab is not None else ProteinVocab()
+            data_file = encode_pairs(data_file, vocab)
+        self.vocab = vocab
+        self.prot_1 = data_file["prot_1"]
+        self.prot_2 = data_file["prot_2"]
+        self.labels = data_file["label"]
         self.n_samples = data_file.shape[0]
 
+        # Feature location of every protein code used by the pairs
+        used = np.unique(np.concatenate([self.prot_1, self.prot_2]))
+        if self.store is not None:
+            self._store_rows = np.full(len(vocab), -1, dtype=np.int64)
+            self._store_rows[used] = [self.store.index[p] for p in vocab.decode(used)]
+        else:
+            self._paths = {c: os.path.join(feature_dir, f"{p}.pt") for c, p in zip(used.tolist(), vocab.decode(used))}
+
+        self.table = None
+        if in_memory:
+            self._load_table()
+
+    def _load_table(self):
+        """
+        Build the protein table and the (n_samples,) row IDs of both sides of each pair.
+        """
+        codes, inverse = np.unique(np.concatenate([self.prot_1, self.prot_2]), return_inverse=True)
+        if self.store is not None:
+            # Proteins aliased to the same store row (identical sequences) share one table row
+            rows, table_rows = np.unique(self._store_rows[codes], return_inverse=True)
+            inverse = table_rows[inverse]
+            table = torch.from_numpy(np.ascontiguousarray(self.store.matrix[rows]))
+        else:
+            table_rows = np.arange(len(codes))
+            table = torch.stack([
+                torch.as_tensor(torch.load(self._paths[c]), dtype=torch.float32) for c in codes.tolist()
+            ]) if len(codes) else torch.zeros(0, 0)
+        inverse = torch.from_numpy(inverse.astype(np.int32).reshape(-1))
+        self._table_rows = np.full(len(self.vocab), -1, dtype=np.int64)
+        self._table_rows[codes] = table_rows
+        self.table = table
+        self.index_1 = inverse[:self.n_samples]
+        self.index_2 = inverse[self.n_samples:]
+        self.label_tensor = torch.from_numpy(np.ascontiguousarray(self.labels))
+
+    def features(self, codes):
+        """
+        (len(codes), dim) features of protein codes used by the pairs, gathered from the
+        in-memory table or read from the store or `.pt` files.
+        """
+        codes = np.asarray(codes)
+        if self.table is not None:
+            return self.table.index_select(0, torch.from_numpy(self._table_rows[codes]))
+        if self.store is not None:
+            return torch.from_numpy(self.store.matrix[self._store_rows[codes]])
+        return torch.stack([torch.as_tensor(torch.load(self._paths[c]), dtype=torch.float32) for c in codes.tolist()])
+
+    def get_batch(self, indices):
+        """
+        Fetch a whole batch of samples as pre-stacked tensors.
+
+        In memory, both sides are gathered from the protein table with `index_select`;
+        from a feature store, with one fancy-index read per side; from `.pt` files,
+        by stacking the loaded vectors.
+
+        Args:
+            indices (sequence or Tensor): Sample indices.
+
+        Returns:
+            tuple: (features1 (B, dim), features2 (B, dim), labels (B,))
+        """
+        indices = torch.as_tensor(indices, dtype=torch.int64)
+        if self.table is None:
+            rows = indices.numpy()
+            return (
+                self.features(self.prot_1[rows]),
+                self.features(self.prot_2[rows]),
+                torch.from_numpy(self.labels[rows].astype(np.int64)),
+            )
+        return (
+            self.table.index_select(0, self.index_1.index_select(0, indices)),
+            self.table.index_select(0, self.index_2.index_select(0, indices)),
+            self.label_tensor.index_select(0, indices).long(),
+        )
+
     def __getitem__(self, index):
         """
         Fetch a single sample: (feature1, feature2, label).
         Returns torch tensors.
+
+        A list/array/tensor of indices (as yielded by a `BatchSampler`, see `make_loader`)
+        returns the whole batch pre-stacked, like `get_batch`.
         """
-        prot1_path = os.path.join(self.feature_dir, f"{self.prot_1[index]}.pt")
-        prot2_path = os.path.join(self.feature_dir, f"{self.prot_2[index]}.pt")
+        if not np.isscalar(index) and not (torch.is_tensor(index) and index.dim() == 0):
+            return self.get_batch(index)
+        label = torch.tensor(int(self.labels[index]))
+        if self.table is not None:
+            return self.table[self.index_1[index]], self.table[self.index_2[index]], label
+        if self.store is not None:
+            prot1 = torch.from_numpy(self.store.matrix[self._store_rows[self.prot_1[index]]])
+            prot2 = torch.from_numpy(self.store.matrix[self._store_rows[self.prot_2[index]]])
+            return prot1, prot2, label
 
-        prot1 = torch.load(prot1_path)
-        prot2 = torch.load(prot2_path)
-        label = torch.tensor(self.labels[index])
+        prot1 = torch.as_tensor(torch.load(self._paths[int(self.prot_1[index])]), dtype=torch.float32)
+        prot2 = torch.as_tensor(torch.load(self._paths[int(self.prot_2[index])]), dtype=torch.float32)
 
         return prot1, prot2, label
 
@@ -56,6 +166,320 @@ class ProtDataset(Dataset):
         return self.n_samples
 
 
+# =========================
+# Negative Sampling
+# =========================
+
+def pair_keys(prot_1, prot_2):
+    """
+    Order-independent int64 key of each protein code pair: (min << 32) | max.
+    """
+    prot_1 = np.asarray(prot_1, dtype=np.int64)
+    prot_2 = np.asarray(prot_2, dtype=np.int64)
+    return (np.minimum(prot_1, prot_2) << 32) | np.maximum(prot_1, prot_2)
+
+
+class NegativeSampledDataset(Dataset):
+    """
+    Wraps a `ProtDataset`: keeps its positive pairs and draws fresh random negative
+    pairs from its protein universe every epoch, instead of a fixed materialized set.
+
+    Known interactions (the positives, plus any `known_positives`, e.g. from other
+    splits) are held as a sorted int64 array of order-independent pair keys; candidate
+    negatives are drawn in vectorized batches and rejected with one `searchsorted`.
+    Self-pairs and duplicate negatives are rejected too. Sampling depends only on
+    `seed` and the epoch (see `set_epoch`).
+
+    Args:
+        dataset (ProtDataset): Pairs to take the positives and protein universe from.
+        ratio (float): Negatives per positive.
+        seed (int): Base seed of the negative sampling.
+        known_positives (np.array or None): Extra (N, 2) protein code pairs never sampled as negatives.
+        keep_negatives (bool): Also keep the negative pairs of `dataset`.
+    """
+
+    def __init__(self, dataset: ProtDataset, ratio: float = 1.0, seed: int = 0,
+                 known_positives: np.ndarray = None, keep_negatives: bool = False):
+        self.dataset = dataset
+        self.ratio = ratio
+        self.seed = seed
+        positive = dataset.labels == 1
+        keep = np.ones_like(positive) if keep_negatives else positive
+        self.base_1 = np.asarray(dataset.prot_1[keep], dtype=np.int32)
+        self.base_2 = np.asarray(dataset.prot_2[keep], dtype=np.int32)
+        self.base_labels = np.asarray(dataset.labels[keep], dtype=np.int8)
+        self.n_negatives = int(round(ratio * positive.sum()))
+
+        self.universe = np.unique(np.concatenate([dataset.prot_1, dataset.prot_2])).astype(np.int32)
+        keys = [pair_keys(dataset.prot_1[positive], dataset.prot_2[positive])]
+        if known_positives is not None:
+            known_positives = np.asarray(known_positives)
+            keys.append(pair_keys(known_positives[:, 0], known_positives[:, 1]))
+        self.positive_keys = np.unique(np.concatenate(keys))
+        self.set_epoch(0)
+
+    def is_known_positive(self, prot_1, prot_2):
+        """
+        Boolean mask of the code pairs that are known interactions.
+        """
+        keys = pair_keys(prot_1, prot_2)
+        found = np.searchsorted(self.positive_keys, keys)
+        found = np.minimum(found, len(self.positive_keys) - 1)
+        return (self.positive_keys[found] == keys) if len(self.positive_keys) else np.zeros(len(keys), dtype=bool)
+
+    def sample_negatives(self, n, rng):
+        """
+        Draw `n` distinct negative code pairs (order-independent) not among the known positives.
+        """
+        max_pairs = len(self.universe) * (len(self.universe) - 1) // 2 - len(self.positive_keys)
+        if n > max_pairs:
+            raise ValueError(f"Cannot sample {n} negatives: only {max_pairs} non-interacting pairs exist")
+        prot_1 = np.zeros(0, dtype=np.int32)
+        prot_2 = np.zeros(0, dtype=np.int32)
+        while len(prot_1) < n:
+            size = int(1.2 * (n - len(prot_1))) + 16
+            a = self.universe[rng.integers(len(self.universe), size=size)]
+            b = self.universe[rng.integers(len(self.universe), size=size)]
+            valid = (a != b) & ~self.is_known_positive(a, b)
+            prot_1 = np.concatenate([prot_1, a[valid]])
+            prot_2 = np.concatenate([prot_2, b[valid]])
+            # Drop repeated pairs, keeping the first draw so the order stays seed-determined
+            _, first = np.unique(pair_keys(prot_1, prot_2), return_index=True)
+            first.sort()
+            prot_1, prot_2 = prot_1[first], prot_2[first]
+        return prot_1[:n], prot_2[:n]
+
+    def set_epoch(self, epoch):
+        """
+        Draw the negatives of `epoch`.
+        """
+        rng = np.random.default_rng([self.seed, epoch])
+        neg_1, neg_2 = self.sample_negatives(self.n_negatives, rng)
+        self.prot_1 = np.concatenate([self.base_1, neg_1])
+        self.prot_2 = np.concatenate([self.base_2, neg_2])
+        self.labels = np.concatenate([self.base_labels, np.zeros(len(neg_1), dtype=np.int8)])
+
+    def get_batch(self, indices):
+        """
+        Fetch a whole batch of samples as pre-stacked tensors (see `ProtDataset.get_batch`).
+        """
+        rows = torch.as_tensor(indices, dtype=torch.int64).numpy()
+        return (
+            self.dataset.features(self.prot_1[rows]),
+            self.dataset.features(self.prot_2[rows]),
+            torch.from_numpy(self.labels[rows].astype(np.int64)),
+        )
+
+    def __getitem__(self, index):
+        if not np.isscalar(index) and not (torch.is_tensor(index) and index.dim() == 0):
+            return self.get_batch(index)
+        prot1, prot2, label = self.get_batch([index])
+        return prot1[0], prot2[0], label[0]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+# =========================
+# Streaming Dataset (sharded pairs)
+# =========================
+
+def write_pair_shards(data_file, output_dir, shard_size=1_000_000, vocab=None):
+    """
+    Split a pair array into `.npy` shards of at most `shard_size` rows.
+
+    Args:
+        data_file (np.array or str): Pair array [protein_id_1, protein_id_2, label] or compact
+            pair table, or its .npy path.
+        output_dir (str): Directory for the shards (`pairs_00000.npy`, ...).
+        shard_size (int): Rows per shard.
+        vocab (ProteinVocab or None): If given, string pairs are written as compact shards
+            encoded with (and extending) this vocabulary.
+
+    Returns:
+        list: Paths of the written shards.
+    """
+    if isinstance(data_file, str):
+        data_file = np.load(data_file, allow_pickle=True)
+    if vocab is not None and not is_compact(data_file):
+        data_file = encode_pairs(data_file, vocab)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, start in enumerate(range(0, data_file.shape[0], shard_size)):
+        path = os.path.join(output_dir, f"pairs_{i:05d}.npy")
+        np.save(path, data_file[start:start + shard_size])
+        paths.append(path)
+    return paths
+
+
+def _load_shard(path):
+    """
+    Read one pair shard as (protein 1 array, protein 2 array, int label array).
+
+    Proteins are ID strings for object-array shards and int32 codes for compact ones
+    (memory-mapped).
+    """
+    try:
+        pairs = np.load(path, mmap_mode="r")
+    except ValueError:  # object arrays cannot be memory-mapped
+        pairs = np.load(path, allow_pickle=True)
+    if is_compact(pairs):
+        return pairs["prot_1"], pairs["prot_2"], pairs["label"]
+    return pairs[:, 0], pairs[:, 1], pairs[:, 2].astype(float).astype(int)
+
+
+def _is_compact_shard(path):
+    """
+    True if the shard at `path` is a compact pair table (memory-mapped, nothing is read).
+    """
+    try:
+        return is_compact(np.load(path, mmap_mode="r"))
+    except ValueError:  # object arrays cannot be memory-mapped
+        return False
+
+
+class ShardedPairDataset(IterableDataset):
+    """
+    Streams protein pairs from shard files, for pair sets larger than memory.
+
+    Only one shard per worker and the shuffle buffer are held in memory at a time.
+    With `shuffle=True`, shard order is permuted every epoch and samples pass through
+    a bounded shuffle buffer (approximate shuffling). Under a multi-worker DataLoader,
+    each worker reads a disjoint subset of the (permuted) shards, so no pair is
+    produced twice.
+
+    Args:
+        feature_dir (str): Directory with protein feature .pt files, or a feature store.
+        shards (str or list): Directory of `.npy` pair shards (read in sorted order) or list of paths.
+        shuffle (bool): Shuffle shard order and samples.
+        buffer_size (int): Number of samples held in the shuffle buffer.
+        seed (int): Base seed; the permutation also depends on the epoch (see `set_epoch`).
+        batch_size (int or None): If given, yield pre-stacked batches of this size
+            (use with `DataLoader(dataset, batch_size=None)`); otherwise single samples.
+        vocab (ProteinVocab or None): Vocabulary of compact shards (see pairs.py).
+    """
+
+    def __init__(self, feature_dir: str, shards, shuffle: bool = False, buffer_size: int = 65536,
+                 seed: int = 0, batch_size: int = None, vocab: ProteinVocab = None):
+        self.feature_dir = feature_dir
+        self.vocab = vocab
+        if isinstance(shards, str):
+            shards = [os.path.join(shards, f) for f in sorted(os.listdir(shards)) if f.endswith(".npy")]
+        self.shards = list(shards)
+        if vocab is None:
+            compact = [path for path in self.shards if _is_compact_shard(path)]
+            if compact:
+                raise ValueError(f"Compact pair shards (e.g. {compact[0]}) hold protein codes: "
+                                 "a ProteinVocab is required to decode them")
+        self.shuffle = shuffle
+        self.buffer_size = buffer_size
+        self.seed = seed
+        self.batch_size = batch_size
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """
+        Set the epoch used to seed the shuffle (call before each epoch).
+        """
+        self.epoch = epoch
+
+    def _worker_shards(self, rng):
+        shards = [self.shards[i] for i in rng.permutation(len(self.shards))] if self.shuffle else self.shards
+        worker = get_worker_info()
+        if worker is None:
+            return shards
+        return shards[worker.id::worker.num_workers]
+
+    def _pairs(self, shards, rng):
+        """
+        Yield (protein_id_1, protein_id_2, label) through the shuffle buffer.
+        """
+        buffer = []
+        for path in shards:
+            prot_1, prot_2, labels = _load_shard(path)
+            for pair in zip(prot_1, prot_2, labels):
+                if not self.shuffle:
+                    yield pair
+                elif len(buffer) < self.buffer_size:
+                    buffer.append(pair)
+                else:
+                    i = rng.integers(len(buffer))
+                    yield buffer[i]
+                    buffer[i] = pair
+        for i in rng.permutation(len(buffer)):
+            yield buffer[i]
+
+    def __iter__(self):
+        # Same permutation in every worker, so the worker shard subsets are disjoint
+        rng = np.random.default_rng([self.seed, self.epoch])
+        shards = self._worker_shards(rng)
+        worker = get_worker_info()
+        sample_rng = np.random.default_rng([self.seed, self.epoch, worker.id if worker else 0])
+
+        # Opened per iterator: a memory map must not be pickled into worker processes
+        store = FeatureStore(self.feature_dir) if FeatureStore.is_store(self.feature_dir) else None
+
+        def features(protein_ids):
+            if self.vocab is not None:
+                protein_ids = self.vocab.decode(protein_ids)
+            if store is not None:
+                return torch.from_numpy(store.rows(protein_ids))
+            return torch.stack([
+                torch.as_tensor(torch.load(os.path.join(self.feature_dir, f"{p}.pt")), dtype=torch.float32)
+                for p in protein_ids
+            ])
+
+        pairs = self._pairs(shards, sample_rng)
+        if self.batch_size is None:
+            for prot1, prot2, label in pairs:
+                yield features([prot1])[0], features([prot2])[0], torch.tensor(int(label))
+            return
+
+        batch = []
+        for pair in pairs:
+            batch.append(pair)
+            if len(batch) == self.batch_size:
+                yield self._stack(batch, features)
+                batch = []
+        if batch:
+            yield self._stack(batch, features)
+
+    @staticmethod
+    def _stack(batch, features):
+        prot_1, prot_2, labels = zip(*batch)
+        return features(list(prot_1)), features(list(prot_2)), torch.tensor([int(l) for l in labels])
+
+
+# =========================
+# Batched DataLoader
+# =========================
+
+def make_loader(dataset, batch_size=256, shuffle=False, pin_memory=False, num_workers=0, drop_last=False):
+    """
+    DataLoader that hands whole index batches to the dataset.
+
+    A `BatchSampler` yields lists of indices and automatic batching is disabled, so
+    `ProtDataset` returns pre-stacked (B, dim) tensors per batch instead of B samples
+    collated one by one by `default_collate`.
+
+    Args:
+        dataset (ProtDataset): Dataset to load from (in-memory mode is fastest).
+        batch_size (int): Samples per batch.
+        shuffle (bool): Shuffle sample order every epoch.
+        pin_memory (bool): Return batches in page-locked memory for faster host-to-GPU copies.
+        num_workers (int): DataLoader worker processes.
+        drop_last (bool): Drop the last incomplete batch.
+
+    Returns:
+        DataLoader: Yields (features1, features2, labels) batches.
+    """
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset, batch_size=None, sampler=BatchSampler(sampler, batch_size, drop_last),
+        pin_memory=pin_memory, num_workers=num_workers
+    )
+
+
 # =========================
 # Main (Example Usage)
 # =========================
@@ -71,12 +495,12 @@ if __name__ == "__main__":
     val_data = np.load(val_data_path)
 
     # Create Dataset objects
-    train_dataset = ProtDataset(feature_dir, train_data)
-    val_dataset = ProtDataset(feature_dir, val_data)
+    train_dataset = ProtDataset(feature_dir, train_data, in_memory=True)
+    val_dataset = ProtDataset(feature_dir, val_data, in_memory=True)
 
     # Create DataLoaders
-    train_loader = DataLoader(train_dataset, batch_size=256, shuffle=True, num_workers=0)
-    val_loader = DataLoader(val_dataset, batch_size=256, shuffle=False, num_workers=0)
+    train_loader = make_loader(train_dataset, batch_size=256, shuffle=True)
+    val_loader = make_loader(val_dataset, batch_size=256, shuffle=False)
 
     print("Train samples:", len(train_dataset))
     print("Val samples:", len(val_dataset))
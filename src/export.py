@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+export.py
+
+Exports a trained `FC` as an inference-only TorchScript artifact:
+- each BatchNorm1d folded into the preceding Linear (and a normalizer first layer
+  folded into the first Linear of each tower)
+- Dropout removed
+- both towers run as one batched matmul per layer, each followed by its LeakyReLU
+- frozen and optimized by TorchScript, loadable with `torch.jit.load` without this code
+
+The export is checked for numerical equivalence with the eval-mode model.
+
+Run using: python export.py model.pt model_inference.pt
+
+Author: Kiana Seraj
+"""
+
+import argparse
+import copy
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from model import fold_batchnorm
+
+
+def folded_tower_weights(model):
+    """
+    Per tower, [(weight (out, in), bias (out,))] x 3 with every BatchNorm folded into its
+    Linear and a normalizer first layer folded into the first Linear. One tower for
+    shared towers, else two. `model` itself (device, training mode) is left unchanged.
+    """
+    model = copy.deepcopy(model).eval()
+    towers = [1] if model.shared_towers else [1, 2]
+    folded = []
+    for tower in towers:
+        layers = [fold_batchnorm(fc, bn) for fc, bn in model.tower_layers(tower)]
+        if model.normalizer is not None:
+            # W((x - shift) * scale) + b == (W * scale) x + (b - W (shift * scale))
+            shift, scale = model.normalizer.shift, model.normalizer.scale
+            w, b = layers[0]
+            layers[0] = (w * scale, b - w @ (shift * scale))
+        folded.append(layers)
+    return folded
+
+
+class InferenceFC(nn.Module):
+    """
+    Inference-only equivalent of an eval-mode `FC`: same inputs and output
+    ((B, 2), or (B, 1) for a single-logit model).
+
+    Args:
+        model (FC): Trained model to convert.
+    """
+
+    def __init__(self, model):
+        super(InferenceFC, self).__init__()
+        self.negative_slope = float(model.relu.negative_slope)
+        self.shared = bool(model.shared_towers)
+
+        weights, biases = [], []
+        for folded in zip(*folded_tower_weights(model)):
+            weights.append(torch.stack([w.t() for w, _ in folded]).contiguous())
+            biases.append(torch.stack([b for _, b in folded])[:, None, :])
+        self.w1, self.w2, self.w3 = weights
+        self.b1, self.b2, self.b3 = biases
+
+        self.fc1 = nn.Linear(256, 128)
+        self.out = nn.Linear(128, model.out.out_features)
+        self.fc1.load_state_dict(model.fc1.state_dict())
+        self.out.load_state_dict(model.out.state_dict())
+        self.requires_grad_(False)
+
+    def towers(self, x1, x2):
+        if self.shared:
+            x = torch.cat((x1, x2), dim=0)
+            x = F.leaky_relu(torch.addmm(self.b1[0], x, self.w1[0]), self.negative_slope)
+            x = F.leaky_relu(torch.addmm(self.b2[0], x, self.w2[0]), self.negative_slope)
+            x = F.leaky_relu(torch.addmm(self.b3[0], x, self.w3[0]), self.negative_slope)
+            return x[:x1.shape[0]], x[x1.shape[0]:]
+        x = torch.stack((x1, x2))
+        x = F.leaky_relu(torch.baddbmm(self.b1, x, self.w1), self.negative_slope)
+        x = F.leaky_relu(torch.baddbmm(self.b2, x, self.w2), self.negative_slope)
+        x = F.leaky_relu(torch.baddbmm(self.b3, x, self.w3), self.negative_slope)
+        return x[0], x[1]
+
+    def forward(self, pro1_data, pro2_data):
+        x1, x2 = self.towers(pro1_data, pro2_data)
+        x = F.leaky_relu(self.fc1(torch.cat((x1, x2), dim=1)), self.negative_slope)
+        return torch.sigmoid(self.out(x))
+
+
+class LinearInferenceFC(nn.Module):
+    """
+    Inference-only `FC` made of plain folded `nn.Linear` + LeakyReLU layers (one
+    Sequential per tower), the form `torch.ao.quantization.quantize_dynamic` rewrites.
+
+    Args:
+        model (FC): Trained model to convert.
+    """
+
+    def __init__(self, model):
+        super(LinearInferenceFC, self).__init__()
+        negative_slope = float(model.relu.negative_slope)
+        towers = []
+        for layers in folded_tower_weights(model):
+            modules = []
+            for weight, bias in layers:
+                linear = nn.Linear(weight.shape[1], weight.shape[0])
+                linear.weight.data.copy_(weight)
+                linear.bias.data.copy_(bias)
+                modules += [linear, nn.LeakyReLU(negative_slope)]
+            towers.append(nn.Sequential(*modules))
+        self.tower1 = towers[0]
+        self.tower2 = towers[-1]
+        self.fc1 = nn.Linear(256, 128)
+        self.relu = nn.LeakyReLU(negative_slope)
+        self.out = nn.Linear(128, model.out.out_features)
+        self.fc1.load_state_dict(model.fc1.state_dict())
+        self.out.load_state_dict(model.out.state_dict())
+        self.requires_grad_(False)
+
+    def forward(self, pro1_data, pro2_data):
+        x = torch.cat((self.tower1(pro1_data), self.tower2(pro2_data)), dim=1)
+        return torch.sigmoid(self.out(self.relu(self.fc1(x))))
+
+
+def check_equivalence(model, exported, inputs=None, n=64, atol=1e-5):
+    """
+    Maximum absolute difference between the eval-mode model and its export. The check
+    runs on an eval-mode copy, so `model` itself (training mode, `stacked`) is left unchanged.
+
+    Args:
+        model (FC): Original model.
+        exported (nn.Module or ScriptModule): Exported model.
+        inputs (tuple or None): (pro1_data, pro2_data) to compare on; random vectors if None.
+        n (int): Number of random pairs when `inputs` is None.
+        atol (float): Maximum allowed difference.
+
+    Raises:
+        ValueError: If the outputs differ by more than `atol`.
+    """
+    model = copy.deepcopy(model).eval()
+    model.stacked = False
+    device = next(model.parameters()).device
+    if inputs is None:
+        generator = torch.Generator().manual_seed(0)
+        inputs = tuple(torch.rand(n, model.input_dim, generator=generator) for _ in range(2))
+    inputs = tuple(x.to(device) for x in inputs)
+    with torch.no_grad():
+        expected = model(*inputs)
+        diff = (exported(*inputs) - expected).abs().max().item()
+    if diff > atol:
+        raise ValueError(f"Exported model differs from the original by {diff:.3g} (> {atol:g})")
+    return diff
+
+
+def export_model(model, path=None, inputs=None, atol=1e-5):
+    """
+    Convert, script, freeze and (optionally) save an inference-only `FC`.
+
+    Args:
+        model (FC): Trained model.
+        path (str or None): Where to save the TorchScript artifact.
+        inputs (tuple or None): Sample (pro1_data, pro2_data) for the equivalence check.
+        atol (float): Maximum allowed difference from the eval-mode model.
+
+    Returns:
+        ScriptModule: The frozen inference model.
+    """
+    scripted = torch.jit.script(InferenceFC(model).eval())
+    exported = torch.jit.optimize_for_inference(torch.jit.freeze(scripted))
+    check_equivalence(model, exported, inputs, atol=atol)
+    if path is not None:
+        torch.jit.save(exported, path)
+    return exported
+
+
+if __name__ == "__main__":
+    from inference import load_model
+
+    parser = argparse.ArgumentParser(description="Export an inference-only TorchScript FC model")
+    parser.add_argument("checkpoint", help="Model state dict (.pt)")
+    parser.add_argument("output", help="TorchScript artifact path")
+    parser.add_argument("--feature-set", nargs="+", default=None, help="Feature blocks of the model input")
+    parser.add_argument("--shared-towers", action="store_true")
+    args = parser.parse_args()
+
+    trained = load_model(args.checkpoint, args.feature_set, args.shared_towers)
+    export_model(trained, args.output)
+    print(f"[Export] wrote {args.output}")
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+feature_cache.py
+
+Content-addressed cache of protein feature vectors used by `extract_features`.
+Vectors are keyed by a hash of the sequence, under a fingerprint of the feature
+configuration, so unchanged and duplicated sequences are never recomputed.
+
+Author: Kiana Seraj
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+
+class FeatureCache:
+    """
+    On-disk cache of computed feature vectors.
+
+    Layout:
+        <cache_dir>/<fingerprint>/<key[:2]>/<key>.npy
+
+    where `key` is the SHA-256 of the sequence and `fingerprint` identifies the
+    feature configuration. Each fingerprint directory holds a `MARKER` file recording
+    the code version it was computed with. Opening the cache evicts only the marked
+    directories of another code version (descriptor implementation or protpy version);
+    other configurations of the same code (feature subsets, normalization modes) are
+    kept side by side, and anything else under `cache_dir` is left untouched.
+
+    Args:
+        cache_dir (str): Root directory of the cache.
+        fingerprint (str): Feature configuration/version fingerprint.
+        code_version (str or None): Version of the feature code; None evicts nothing.
+    """
+
+    MANIFEST = "feature_manifest.json"
+    MARKER = "feature_cache.json"
+
+    def __init__(self, cache_dir: str, fingerprint: str, code_version: str = None):
+        self.fingerprint = fingerprint
+        self.root = os.path.join(cache_dir, fingerprint)
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, self.MARKER), "w") as f:
+            json.dump({"fingerprint": fingerprint, "code_version": code_version}, f)
+
+        # Evict entries computed by other feature code (only directories this cache
+        # created, never unrelated data sharing `cache_dir`)
+        if code_version is None:
+            return
+        for name in os.listdir(cache_dir):
+            marker = os.path.join(cache_dir, name, self.MARKER)
+            if name == fingerprint or not os.path.isfile(marker):
+                continue
+            try:
+                with open(marker) as f:
+                    stale = json.load(f).get("code_version") != code_version
+            except (OSError, ValueError):
+                stale = True
+            if stale:
+                shutil.rmtree(os.path.join(cache_dir, name))
+
+    @staticmethod
+    def key(sequence):
+        """
+        Cache key of a sequence.
+        """
+        return hashlib.sha256(sequence.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """
+        Return the cached feature vector as a list, or None on a miss (an unreadable
+        entry counts as a miss).
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path).tolist()
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def put(self, key, features):
+        """
+        Store a feature vector (float64, so cached values are exact).
+
+        Written to a temporary file and renamed, so an interrupted write never leaves a
+        truncated entry.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(features, dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    def read_manifest(self, output_dir):
+        """
+        Protein ID -> cache key of the vectors currently written in `output_dir`.
+
+        Returns an empty mapping if the outputs were written with another fingerprint.
+        """
+        path = os.path.join(output_dir, self.MANIFEST)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get("fingerprint") != self.fingerprint:
+            return {}
+        return manifest["proteins"]
+
+    def write_manifest(self, output_dir, proteins):
+        """
+        Record which cache key each protein in `output_dir` was written from.
+        """
+        with open(os.path.join(output_dir, self.MANIFEST), "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "proteins": proteins}, f, sort_keys=True)
@@ -5,21 +5,90 @@ feature_generator.py
 Generates protein features from amino acid sequences using multiple descriptors:
 - AAC, DPC
 - Physicochemical encodings (CTD)
-- Quasi sequence order (QSOrder)
-- Sequence order coupling (SOCNumber)
-- APAAC (normalized)
+- Quasi sequence order (QSOrder), computed in-process or read from protFeat output
+- Sequence order coupling (SOCNumber), computed in-process or read from protFeat output
+- APAAC (per-vector normalized, or raw for a dataset-level normalizer, see normalizer.py)
 
-Outputs features as tensors using PyTorch.
+Outputs features as per-protein PyTorch files or as a consolidated feature store.
 
 Author: Kiana Seraj
 """
 
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
 import numpy as np
 import torch
+from tqdm import tqdm
 import protpy
 from constants import *
-from utils import AAC, DPC, composition_descriptor, transition_descriptor, distribution_descriptor
+from feature_cache import FeatureCache
+from feature_store import FeatureStoreWriter
+from profiling import ExtractionProfile
+from utils import AAC, DPC, AAC_batch, DPC_batch, COMPOSITION_AA, ctd_descriptor, quasi_sequence_order, sequence_order_coupling_number, read_fasta
+
+# =========================
+# Feature Configuration
+# =========================
+
+# Length of the full feature vector (see README and `FEATURE_BLOCKS` in constants.py)
+FEATURE_DIM = sum(FEATURE_BLOCKS.values())
+
+# Bump when a descriptor implementation changes its output, to invalidate cached vectors
+FEATURE_VERSION = 1
+
+QSORDER_NLAG = 30
+QSORDER_WEIGHT = 0.1
+SOC_NLAG = 30
+APAAC_LAMDA = 30
+APAAC_WEIGHT = 0.5
+
+# "per_vector": min-max scale each protein's SOC-Grantham and APAAC vectors (original behaviour)
+# "none": keep raw values, to be scaled by a normalizer fitted over the whole store
+NORMALIZATION_MODES = {
+    "per_vector": {"soc_grantham": "minmax_0_1", "apaac": "minmax_-1_1"},
+    "none": {},
+}
+
+FEATURE_CONFIG = {
+    "version": FEATURE_VERSION,
+    "descriptors": list(FEATURE_BLOCKS),
+    "qsorder": {"nlag": QSORDER_NLAG, "weight": QSORDER_WEIGHT},
+    "soc": {"nlag": SOC_NLAG},
+    "apaac": {"lamda": APAAC_LAMDA, "weight": APAAC_WEIGHT},
+    "normalization": NORMALIZATION_MODES["per_vector"],
+    "protpy": protpy.__version__,
+}
+
+
+def feature_config(feature_set=None, normalization="per_vector"):
+    """
+    Feature configuration of a feature set (the descriptor list restricted to its blocks)
+    and normalization mode.
+    """
+    if normalization not in NORMALIZATION_MODES:
+        raise ValueError(f"Unknown normalization {normalization!r}, expected one of {list(NORMALIZATION_MODES)}")
+    return dict(FEATURE_CONFIG, descriptors=resolve_feature_set(feature_set),
+                normalization=NORMALIZATION_MODES[normalization])
+
+
+def feature_code_version(config=FEATURE_CONFIG):
+    """
+    Version of the descriptor code behind a configuration (FEATURE_VERSION and protpy).
+    """
+    return f"{config['version']}/{config['protpy']}"
+
+
+def feature_fingerprint(config=FEATURE_CONFIG):
+    """
+    Short hash identifying a feature configuration (used to key cached vectors).
+    """
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
 
 # =========================
 # Utility: Min-Max Normalization
@@ -27,16 +96,20 @@ from utils import AAC, DPC, composition_descriptor, transition_descriptor, distr
 
 def norm(x):
     """
-    Normalize to range [0, 1].
+    Normalize to range [0, 1]. A constant vector maps to zeros.
     """
     min_val, max_val = min(x), max(x)
+    if max_val == min_val:
+        return [0.0] * len(x)
     return [(i - min_val) / (max_val - min_val) for i in x]
 
 def norm_(x):
     """
-    Normalize to range [-1, 1].
+    Normalize to range [-1, 1]. A constant vector maps to zeros.
     """
     min_val, max_val = min(x), max(x)
+    if max_val == min_val:
+        return [0.0] * len(x)
     return [2 * ((i - min_val) / (max_val - min_val)) - 1 for i in x]
 
 
@@ -49,22 +122,49 @@ def CTD(sequence):
     Computes CTD (Composition, Transition, Distribution) features
     for all predefined physicochemical properties.
 
+    The sequence is encoded once into a class matrix covering all properties
+    (see `utils.ctd_descriptor`); the result is identical to chaining
+    `composition_descriptor`, `distribution_descriptor` and `transition_descriptor`
+    over `physiochemical_properties`.
+
     Returns:
         list: 504-length CTD vector.
     """
-    ctd = []
-    for descriptor_func in physiochemical_properties:
-        encoded = descriptor_func(sequence)
-        ctd.extend(composition_descriptor(encoded))
-        ctd.extend(distribution_descriptor(encoded))
-        ctd.extend(transition_descriptor(encoded))
-    return ctd
+    return ctd_descriptor(sequence)
 
 
 # =========================
-# Load QSOrder and SOCNumber (from precomputed txt files)
+# QSOrder and SOCNumber (in-process, or loaded from precomputed txt files)
 # =========================
 
+def compute_QSOrder(sequence):
+    """
+    Compute the QSOrder descriptor in-process (same values as the protFeat txt output).
+
+    Args:
+        sequence (str): Amino acid sequence.
+
+    Returns:
+        list: QSOrder descriptor.
+    """
+    return quasi_sequence_order(sequence, nlag=QSORDER_NLAG, weight=QSORDER_WEIGHT)
+
+
+def compute_SOCNumber(sequence, normalize=True):
+    """
+    Compute SOCNumber in-process and normalize the Grantham part, as `SOCNumber` does.
+
+    Args:
+        sequence (str): Amino acid sequence.
+        normalize (bool): Min-max scale the Grantham part (per-vector normalization).
+
+    Returns:
+        tuple: (Schneider SOC [30], normalized Grantham SOC [30])
+    """
+    soc = sequence_order_coupling_number(sequence, nlag=SOC_NLAG)
+    return soc[:SOC_NLAG], norm(soc[SOC_NLAG:]) if normalize else soc[SOC_NLAG:]
+
+
 def QSOrder(protname, feature_dir):
     """
     Load QSOrder descriptor from file.
@@ -82,13 +182,14 @@ def QSOrder(protname, feature_dir):
     return [float(v) for v in values]
 
 
-def SOCNumber(protname, feature_dir):
+def SOCNumber(protname, feature_dir, normalize=True):
     """
     Load Sequence Order Coupling Number (SOCNumber) from file and normalize Grantham part.
 
     Args:
         protname (str): Protein ID.
         feature_dir (str): Directory containing SOCNumber output txt.
+        normalize (bool): Min-max scale the Grantham part (per-vector normalization).
 
     Returns:
         tuple: (Schneider SOC [30], normalized Grantham SOC [30])
@@ -97,59 +198,324 @@ def SOCNumber(protname, feature_dir):
     with open(path) as f:
         values = f.read().strip().split("\t")[1:]
     soc = [float(v) for v in values]
-    return soc[:30], norm(soc[30:])
+    return soc[:30], norm(soc[30:]) if normalize else soc[30:]
 
 
 # =========================
 # APAAC Feature Generator
 # =========================
 
-def APAAC(sequence):
+def APAAC(sequence, normalize=True):
     """
     Amphiphilic Pseudo Amino Acid Composition with normalization.
 
     Args:
         sequence (str): Amino acid sequence.
+        normalize (bool): Scale the vector to [-1, 1] (per-vector normalization).
 
     Returns:
         list: Normalized APAAC features.
     """
-    apaac = list(protpy.amphiphilic_pseudo_amino_acid_composition(sequence, lamda=30, weight=0.5).values[0])
-    return norm_(apaac)
+    apaac = list(protpy.amphiphilic_pseudo_amino_acid_composition(sequence, lamda=APAAC_LAMDA, weight=APAAC_WEIGHT).values[0])
+    return norm_(apaac) if normalize else apaac
 
 
 # =========================
 # Main Feature Extraction Pipeline
 # =========================
 
-def extract_features(sequence_dir, feature_dir, output_dir):
+def batch_compositions(sequences, feature_set=None):
     """
-    Extract features for all sequences in a directory.
+    AAC and DPC blocks of many sequences, each computed in one vectorized pass
+    (`AAC_batch` / `DPC_batch`) instead of one protpy call per sequence.
+
+    Sequences the batch functions reject (non-canonical residues, too short) are left
+    out, so `protein_features` computes (and reports the error of) each on its own.
 
     Args:
-        sequence_dir (str): Path to directory containing .npy files with protein sequences.
-        feature_dir (str): Path to directory containing QSOrder and SOCNumber files.
-        output_dir (str): Path to directory to save torch tensor features.
+        sequences (list): Amino acid sequences.
+        feature_set (iterable or None): Blocks to compute (only "aac" and "dpc" are batched).
+
+    Returns:
+        list: Per sequence, {block: (values, seconds per sequence)} for `protein_features`.
     """
-    os.makedirs(output_dir, exist_ok=True)
-    
-    for filename in os.listdir(sequence_dir):
-        if not filename.endswith(".npy"):
+    blocks = resolve_feature_set(feature_set)
+    precomputed = [{} for _ in sequences]
+    for block, batch_fn, min_length in (("aac", AAC_batch, 1), ("dpc", DPC_batch, 2)):
+        if block not in blocks:
+            continue
+        valid = [i for i, s in enumerate(sequences)
+                 if len(s) >= min_length and set(s.upper()) <= set(COMPOSITION_AA)]
+        if not valid:
+            continue
+        start = time.perf_counter()
+        rows = batch_fn([sequences[i] for i in valid]).tolist()
+        seconds = (time.perf_counter() - start) / len(valid)
+        for i, row in zip(valid, rows):
+            precomputed[i][block] = (row, seconds)
+    return precomputed
+
+
+def protein_features(sequence, protname, feature_dir=None, feature_set=None, timings=None,
+                     normalization="per_vector", precomputed=None):
+    """
+    Build the feature vector of one protein (1164-dim for the full feature set).
+
+    Only the blocks of `feature_set` are computed.
+
+    Args:
+        sequence (str): Amino acid sequence.
+        protname (str): Protein ID (used to locate protFeat txt files).
+        feature_dir (str or None): Directory with QSOrder/SOCNumber txt files, or None.
+        feature_set (iterable or None): Blocks to compute (see `resolve_feature_set`).
+        timings (dict or None): If given, filled with block name -> seconds spent
+            (the shared SOCNumber computation is counted under "soc_schneider").
+        normalization (str): "per_vector" to min-max scale SOC-Grantham and APAAC per
+            protein, "none" for raw values (see normalizer.py for dataset-level scaling).
+        precomputed (dict or None): Blocks already computed for this sequence, as returned
+            by `batch_compositions`.
+
+    Returns:
+        list: Concatenated feature vector.
+    """
+    normalize = normalization == "per_vector"
+    features = []
+    soc = None
+    for block in resolve_feature_set(feature_set):
+        if precomputed and block in precomputed:
+            values, seconds = precomputed[block]
+            features += values
+            if timings is not None:
+                timings[block] = seconds
             continue
-        
-        filepath = os.path.join(sequence_dir, filename)
-        sequence = np.load(filepath, allow_pickle=True).item()
-        protname = filename.split(".")[0]
+        if timings is not None:
+            start = time.perf_counter()
+
+        if block == "aac":
+            features += AAC(sequence)
+        elif block == "dpc":
+            features += DPC(sequence)
+        elif block == "ctd":
+            features += CTD(sequence)
+        elif block == "qsorder":
+            features += compute_QSOrder(sequence) if feature_dir is None else QSOrder(protname, feature_dir)
+        elif block in ("soc_schneider", "soc_grantham"):
+            if soc is None:
+                soc = (compute_SOCNumber(sequence, normalize) if feature_dir is None
+                       else SOCNumber(protname, feature_dir, normalize))
+            features += soc[0] if block == "soc_schneider" else soc[1]
+        elif block == "apaac":
+            features += APAAC(sequence, normalize)
+
+        if timings is not None:
+            timings[block] = time.perf_counter() - start
+    return [float(v) for v in features]
+
+
+def _extract_one(job):
+    """
+    Worker: compute the features of one protein.
+
+    Any exception is caught and returned so that one bad protein cannot abort the run.
+
+    Returns:
+        tuple: (features or None, error message or None, stage timings or None)
+    """
+    sequence, protname, feature_dir, feature_set, profile, normalization, precomputed = job
+    timings = {} if profile else None
+    try:
+        features = protein_features(sequence, protname, feature_dir, feature_set, timings, normalization, precomputed)
+        return features, None, timings
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", None
 
-        aac = AAC(sequence)
-        dpc = DPC(sequence)
-        ctd = CTD(sequence)
-        qsorder = QSOrder(protname, feature_dir)
-        soc_schneider, soc_grantham = SOCNumber(protname, feature_dir)
-        apaac = APAAC(sequence)
 
-        features = aac + dpc + ctd + qsorder + soc_schneider + soc_grantham + apaac
-        torch.save(features, os.path.join(output_dir, f"{protname}.pt"))
+def iter_sequences(source):
+    """
+    Stream (protname, sequence, error) records from a sequence source.
+
+    Args:
+        source (str or file): Directory of `.npy` files (one pickled sequence each,
+            read in sorted file-name order), or a (gzip) multi-FASTA path or stream.
+
+    Yields:
+        tuple: (protname, sequence or None, error message or None)
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if not filename.endswith(".npy"):
+                continue
+            protname = filename.split(".")[0]
+            try:
+                yield protname, np.load(os.path.join(source, filename), allow_pickle=True).item(), None
+            except Exception as e:
+                yield protname, None, f"{type(e).__name__}: {e}"
+    else:
+        for protname, sequence in read_fasta(source):
+            yield protname, sequence, None
+
+
+def extract_features(sequence_dir, feature_dir, output_dir, workers=1, chunk_size=16,
+                     error_report="extraction_errors.tsv", cache_dir=None, output_format="pt",
+                     batch_size=1024, feature_set=None, profile_path=None, profile_top_n=10,
+                     normalization="per_vector"):
+    """
+    Extract features for all sequences of a directory or multi-FASTA file.
+
+    Records are read lazily and pushed through the descriptors in batches of
+    `batch_size`, each written out before the next is read, so memory does not grow
+    with the input size. Proteins are processed in input order (sorted file names
+    for a directory), so repeated runs on the same input produce identical output.
+    Proteins that fail are skipped and listed in `error_report`
+    (one "protname<TAB>error" line each) instead of aborting the run.
+
+    With `cache_dir`, vectors are cached by sequence hash under the current
+    feature fingerprint: cached sequences are not recomputed, identical sequences
+    are computed once, and `.pt` outputs that are already up to date are skipped.
+    Only then is a protein ID -> key manifest of the `.pt` outputs kept (one entry per
+    protein); without a cache nothing is retained across batches, and a protein ID
+    repeated in the input overwrites its earlier `.pt` file.
+
+    Args:
+        sequence_dir (str or file): Directory containing .npy files with protein sequences,
+            or a (optionally gzip-compressed) multi-FASTA path or stream.
+        feature_dir (str or None): Directory containing precomputed QSOrder and SOCNumber
+            txt files. If None, both descriptors are computed in-process.
+        output_dir (str): Output directory: one `<protname>.pt` per protein, or a feature store.
+        workers (int): Number of worker processes (1 = run in this process).
+        chunk_size (int): Number of proteins handed to a worker at a time.
+        error_report (str): File name of the error report, written in `output_dir`.
+        cache_dir (str or None): Directory of the incremental feature cache.
+        output_format (str): "pt" for per-protein torch files, "store" for a
+            memory-mappable feature store (see feature_store.py).
+        batch_size (int): Number of records read and processed at a time.
+        feature_set (iterable or None): Blocks to compute (see `resolve_feature_set`);
+            None computes the full 1164-dim vector. A store records the block offsets.
+        profile_path (str or None): If given, time every descriptor stage and write a JSON
+            summary (see profiling.ExtractionProfile) to this path at the end of the run.
+        profile_top_n (int): Number of slowest proteins listed in the profile.
+        normalization (str): "per_vector" (original per-protein min-max scaling) or "none"
+            (raw values; fit a dataset-level normalizer on the store afterwards, see normalizer.py).
+
+    Returns:
+        dict: Protein ID -> error message for every failed protein.
+    """
+    if output_format not in ("pt", "store"):
+        raise ValueError(f"Unknown output_format {output_format!r}, expected 'pt' or 'store'")
+    os.makedirs(output_dir, exist_ok=True)
+    blocks = resolve_feature_set(feature_set)
+    config = feature_config(blocks, normalization)
+
+    cache = None
+    if cache_dir is not None:
+        if feature_dir is not None:
+            raise ValueError("The feature cache requires in-process QSOrder/SOCNumber (feature_dir=None)")
+        cache = FeatureCache(cache_dir, feature_fingerprint(config), feature_code_version(config))
+    manifest = cache.read_manifest(output_dir) if cache is not None and output_format == "pt" else {}
+
+    profile = ExtractionProfile(profile_top_n) if profile_path is not None else None
+    errors = {}
+    written = {}  # Protein ID -> cache key, only kept for the `.pt` manifest
+    track_written = cache is not None and output_format == "pt"
+    n_proteins = n_computed = 0
+    records = iter_sequences(sequence_dir)
+
+    with ExitStack() as stack:
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers)) if workers > 1 else None
+        if output_format == "store":
+            writer = stack.enter_context(FeatureStoreWriter(
+                output_dir, sum(FEATURE_BLOCKS[b] for b in blocks),
+                metadata={"fingerprint": feature_fingerprint(config), "config": config,
+                          "blocks": feature_block_offsets(blocks)}
+            ))
+        progress = stack.enter_context(tqdm(unit="prot", desc="Extracting"))
+
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            n_proteins += len(batch)
+
+            # Group proteins by key; with a cache, identical sequences share one computation
+            sequences = {}
+            groups = {}
+            for protname, sequence, error in batch:
+                if error is not None:
+                    errors[protname] = error
+                    continue
+                sequences[protname] = sequence
+                key = cache.key(sequence) if cache is not None else protname
+                groups.setdefault(key, []).append(protname)
+
+            plan = []  # (key, protnames, whether the vector is cached)
+            for key, protnames in groups.items():
+                if manifest:
+                    up_to_date = [
+                        p for p in protnames
+                        if manifest.get(p) == key and os.path.exists(os.path.join(output_dir, f"{p}.pt"))
+                    ]
+                    written.update((p, key) for p in up_to_date)
+                    protnames = [p for p in protnames if p not in up_to_date]
+                    if not protnames:
+                        continue
+                plan.append((key, protnames, cache is not None and key in cache))
+
+            to_compute = [protnames[0] for _, protnames, cached in plan if not cached]
+            # AAC/DPC of the whole batch in one vectorized pass each
+            precomputed = batch_compositions([sequences[p] for p in to_compute], blocks)
+            jobs = [
+                (sequences[p], p, feature_dir, blocks, profile is not None, normalization, blocks_done)
+                for p, blocks_done in zip(to_compute, precomputed)
+            ]
+            n_computed += len(jobs)
+            if executor is not None:
+                results = executor.map(_extract_one, jobs, chunksize=chunk_size)
+            else:
+                results = map(_extract_one, jobs)
+            results = iter(results)
+
+            # Results are consumed in plan order, so outputs do not depend on cache state
+            for key, protnames, cached in plan:
+                features = cache.get(key) if cached else None
+                if features is None:
+                    if cached:  # Unreadable cache entry (e.g. an interrupted run): recompute it here
+                        features, error, timings = _extract_one((
+                            sequences[protnames[0]], protnames[0], feature_dir, blocks,
+                            profile is not None, normalization, None))
+                    else:
+                        features, error, timings = next(results)
+                    if timings is not None:
+                        profile.add(protnames[0], len(sequences[protnames[0]]), timings)
+                    if error is not None:
+                        errors.update((p, error) for p in protnames)
+                        continue
+                    if cache is not None:
+                        cache.put(key, features)
+
+                if output_format == "store":
+                    writer.add(features, protnames)
+                else:
+                    for p in protnames:
+                        torch.save(features, os.path.join(output_dir, f"{p}.pt"))
+                if track_written:
+                    written.update((p, key) for p in protnames)
+            progress.update(len(batch))
+
+    if cache is not None:
+        print(f"[Cache] {n_computed} of {n_proteins} proteins computed, the rest reused")
+        if track_written:
+            cache.write_manifest(output_dir, written)
+
+    with open(os.path.join(output_dir, error_report), "w") as f:
+        for protname, error in sorted(errors.items()):
+            f.write(f"{protname}\t{error}\n")
+    if errors:
+        print(f"[Warning] {len(errors)} of {n_proteins} proteins failed, see {error_report}")
+    if profile is not None:
+        summary = profile.write(profile_path)
+        print(f"[Profile] {summary['sequences_per_second']:.1f} seq/s, "
+              f"{summary['residues_per_second']:.0f} residues/s, summary in {profile_path}")
+    return errors
 
 
 # =========================
@@ -159,7 +525,8 @@ def extract_features(sequence_dir, feature_dir, output_dir):
 if __name__ == "__main__":
     # Example usage (edit these paths as needed)
     extract_features(
-        sequence_dir="PATH/to/sequence_directory",
-        feature_dir="PATH/to/feature_extraction_output",
-        output_dir="PATH/to/save_tensor_features"
+        sequence_dir="PATH/to/sequence_directory",  # or "PATH/to/uniprot_sprot.fasta.gz"
+        feature_dir=None,  # or "PATH/to/feature_extraction_output" for protFeat txt files
+        output_dir="PATH/to/save_tensor_features",
+        workers=os.cpu_count(),
     )
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+feature_store.py
+
+Consolidated feature store: one contiguous float32 matrix of protein feature vectors
+plus a protein-ID -> row index, replacing one pickled `.pt` file per protein.
+
+Layout of a store directory:
+    features.bin   raw float32 rows, memory-mapped on read
+    index.json     {"dim", "rows", "index": {protein_id: row}, "metadata": {...}}
+    normalizer.json  optional fitted feature statistics (see normalizer.py)
+
+The feature-set spec (which descriptor blocks a vector holds, recorded in the store
+metadata) is defined in constants.py.
+
+Author: Kiana Seraj
+"""
+
+import json
+import os
+import numpy as np
+
+FEATURES_FILE = "features.bin"
+INDEX_FILE = "index.json"
+NORMALIZER_FILE = "normalizer.json"
+
+
+class FeatureStoreWriter:
+    """
+    Append-only writer for a feature store.
+
+    Rows are streamed to disk as they are added; the index is written on `close()`,
+    so an interrupted run never leaves a store that looks complete.
+
+    Args:
+        path (str): Store directory (created if needed).
+        dim (int): Length of each feature vector.
+        metadata (dict): Extra JSON-serializable information saved with the index.
+    """
+
+    def __init__(self, path: str, dim: int, metadata: dict = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dim = dim
+        self.metadata = metadata or {}
+        self.index = {}
+        self.rows = 0
+        # Drop the index and any statistics fitted on the previous contents
+        for name in (INDEX_FILE, NORMALIZER_FILE):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        self._file = open(os.path.join(path, FEATURES_FILE), "wb")
+
+    def add(self, features, protein_ids):
+        """
+        Append one feature vector, shared by all `protein_ids` (e.g. identical sequences).
+        """
+        row = np.asarray(features, dtype=np.float32)
+        if row.shape != (self.dim,):
+            raise ValueError(f"Expected a feature vector of length {self.dim}, got shape {row.shape}")
+        self._file.write(row.tobytes())
+        for protein_id in protein_ids:
+            self.index[protein_id] = self.rows
+        self.rows += 1
+
+    def close(self):
+        self._file.close()
+        with open(os.path.join(self.path, INDEX_FILE), "w") as f:
+            json.dump({"dim": self.dim, "rows": self.rows, "index": self.index, "metadata": self.metadata}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class FeatureStore:
+    """
+    Read-only, memory-mapped access to a feature store.
+
+    Rows are returned as views on the mapped file (copy-on-write), so reading a
+    protein costs no file open and no deserialization.
+
+    Args:
+        path (str): Store directory written by `FeatureStoreWriter`.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            info = json.load(f)
+        self.path = path
+        self.dim = info["dim"]
+        self.index = info["index"]
+        self.metadata = info["metadata"]
+        self.matrix = np.memmap(
+            os.path.join(path, FEATURES_FILE), dtype=np.float32, mode="c",
+            shape=(info["rows"], self.dim)
+        ) if info["rows"] else np.zeros((0, self.dim), dtype=np.float32)
+
+    @property
+    def blocks(self):
+        """
+        Feature block name -> [start, end) column range, if recorded by the writer.
+        """
+        return self.metadata.get("blocks")
+
+    @staticmethod
+    def is_store(path):
+        """
+        True if `path` is a feature store directory.
+        """
+        return os.path.exists(os.path.join(path, INDEX_FILE))
+
+    def row(self, protein_id):
+        """
+        Feature vector of one protein (zero-copy view).
+        """
+        return self.matrix[self.index[protein_id]]
+
+    def rows(self, protein_ids):
+        """
+        (len(protein_ids), dim) array of feature vectors.
+        """
+        return self.matrix[[self.index[p] for p in protein_ids]]
+
+    def __contains__(self, protein_id):
+        return protein_id in self.index
+
+    def __len__(self):
+        return len(self.index)
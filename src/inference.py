@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+inference.py
+
+Pair scoring with cached per-protein embeddings.
+
+A protein's tower embedding depends only on that protein, so each protein is encoded
+once per tower and pairs are scored by running only the head (`fc1` + `out`) on the
+cached 128-dim vectors. Embeddings live in an LRU-bounded in-memory cache that can
+spill evicted entries to disk for the lifetime of the scorer.
+
+Author: Kiana Seraj
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+from collections import OrderedDict
+import numpy as np
+import torch
+from feature_store import FeatureStore
+from model import FC
+from normalizer import FeatureNormalizer
+
+
+def load_model(checkpoint, feature_set=None, shared_towers=False, map_location="cpu"):
+    """
+    Build an `FC` from a saved state dict (path or dict), in eval mode.
+
+    A normalizer first layer is recreated if the checkpoint holds one, and the output
+    layer (two units, or one with `single_logit`) follows the checkpoint.
+    """
+    state = torch.load(checkpoint, map_location=map_location) if isinstance(checkpoint, str) else checkpoint
+    normalizer = None
+    if "normalizer.shift" in state:
+        normalizer = FeatureNormalizer(torch.zeros_like(state["normalizer.shift"]), torch.ones_like(state["normalizer.scale"]))
+    single_logit = state["out.weight"].shape[0] == 1
+    model = FC(feature_set, normalizer=normalizer, shared_towers=shared_towers, single_logit=single_logit)
+    model.load_state_dict(state)
+    return model.eval()
+
+
+def model_fingerprint(model):
+    """
+    Short hash of a model's state dict, so cached embeddings never outlive the weights.
+    """
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed by (protein_id, tower), with optional disk spill.
+
+    When more than `max_items` entries are held, the least recently used one is
+    evicted; with `spill_dir` it is first written to a fresh `<spill_dir>/<fingerprint>-*/`
+    directory owned by this cache and read back on its next miss instead of being
+    recomputed. The spill directory is removed with the cache, so embeddings of
+    re-extracted features are never served from an earlier run.
+
+    Args:
+        max_items (int): Maximum number of embeddings held in memory.
+        spill_dir (str or None): Parent directory for evicted embeddings.
+        fingerprint (str): Model fingerprint the spilled embeddings belong to.
+    """
+
+    def __init__(self, max_items: int = 100_000, spill_dir: str = None, fingerprint: str = "model"):
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.spill_root = None
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.spill_root = tempfile.mkdtemp(prefix=f"{fingerprint}-", dir=spill_dir)
+            weakref.finalize(self, shutil.rmtree, self.spill_root, ignore_errors=True)
+        self.hits = self.misses = 0
+
+    def _spill_path(self, key):
+        name = hashlib.sha256(f"{key[1]}:{key[0]}".encode()).hexdigest()
+        return os.path.join(self.spill_root, f"{name}.npy")
+
+    def get(self, key):
+        """
+        Cached embedding of `key`, or None on a miss.
+        """
+        embedding = self.entries.get(key)
+        if embedding is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+        if self.spill_root is not None and os.path.exists(self._spill_path(key)):
+            embedding = torch.from_numpy(np.load(self._spill_path(key)))
+            self.put(key, embedding)
+            self.hits += 1
+            return embedding
+        self.misses += 1
+        return None
+
+    def put(self, key, embedding):
+        self.entries[key] = embedding
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_items:
+            evicted, value = self.entries.popitem(last=False)
+            if self.spill_root is not None and not os.path.exists(self._spill_path(evicted)):
+                np.save(self._spill_path(evicted), value.numpy())
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PairScorer:
+    """
+    Scores protein pairs with an `FC` model, computing each protein's tower embedding once.
+
+    Args:
+        model (FC): Trained model (put in eval mode).
+        features (FeatureStore or str or callable): Source of input feature vectors: a feature
+            store (or its directory), or a function mapping a list of protein IDs to a (N, dim) array.
+        cache_size (int): Maximum number of embeddings held in memory.
+        spill_dir (str or None): Parent directory for embeddings evicted from memory
+            (a per-scorer subdirectory, removed with the scorer).
+        batch_size (int): Proteins encoded / pairs scored per forward call.
+        bf16 (bool): Run the model under bfloat16 autocast (embeddings and scores are kept in fp32).
+    """
+
+    def __init__(self, model, features, cache_size: int = 100_000, spill_dir: str = None, batch_size: int = 4096,
+                 bf16: bool = False):
+        self.model = model.eval()
+        if isinstance(features, str):
+            features = FeatureStore(features)
+        self.features = features.rows if isinstance(features, FeatureStore) else features
+        self.device = next(model.parameters()).device
+        self.batch_size = batch_size
+        self.bf16 = bf16
+        fingerprint = model_fingerprint(model) + ("-bf16" if bf16 else "")
+        self.cache = EmbeddingCache(cache_size, spill_dir, fingerprint)
+
+    def _autocast(self):
+        return torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=self.bf16)
+
+    def embed(self, protein_ids, tower=1):
+        """
+        (N, 128) tower embeddings of `protein_ids`, encoding only uncached proteins.
+        """
+        embeddings = [self.cache.get((p, tower)) for p in protein_ids]
+        missing = list(dict.fromkeys(p for p, e in zip(protein_ids, embeddings) if e is None))
+        computed = {}
+        with torch.no_grad(), self._autocast():
+            for start in range(0, len(missing), self.batch_size):
+                chunk = missing[start:start + self.batch_size]
+                x = torch.as_tensor(np.asarray(self.features(chunk)), dtype=torch.float32).to(self.device)
+                for p, e in zip(chunk, self.model.encode(x, tower).float().cpu()):
+                    computed[p] = e.clone()
+                    self.cache.put((p, tower), computed[p])
+        embeddings = [e if e is not None else computed[p] for p, e in zip(protein_ids, embeddings)]
+        return torch.stack(embeddings) if embeddings else torch.zeros(0, 128)
+
+    def score(self, pairs, symmetric=False):
+        """
+        Interaction probability (class 1) of each (protein_id_1, protein_id_2) pair.
+
+        Args:
+            pairs (iterable): Protein ID pairs.
+            symmetric (bool): Average the scores of (a, b) and (b, a).
+
+        Returns:
+            Tensor: (N,) probabilities.
+        """
+        pairs = list(pairs)
+        scores = []
+        with torch.no_grad(), self._autocast():
+            for start in range(0, len(pairs), self.batch_size):
+                prot_1, prot_2 = zip(*pairs[start:start + self.batch_size])
+                e1 = self.embed(list(prot_1), 1).to(self.device)
+                e2 = self.embed(list(prot_2), 2).to(self.device)
+                y = self.model.head(e1, e2)
+                if symmetric:
+                    y = (y + self.model.head(self.embed(list(prot_2), 1).to(self.device),
+                                             self.embed(list(prot_1), 2).to(self.device))) / 2
+                scores.append(y[:, -1].float().cpu())
+        return torch.cat(scores) if scores else torch.zeros(0)
@@ -4,12 +4,15 @@ metrics.py
 
 Custom evaluation metrics for binary classification.
 Includes: accuracy, precision, recall, specificity, F1, MCC, AUC-ROC, AUPRC.
+Also: `MetricAccumulator`, which collects scores, labels and loss of an epoch on the
+compute device and evaluates them once at the end of the epoch.
 
 Author: Kiana Seraj
 """
 
 import numpy as np
 import math
+import torch
 from sklearn.metrics import roc_auc_score, average_precision_score
 
 
@@ -22,9 +25,9 @@ def pred_to_classes(predicted, threshold=0.5):
         threshold (float): Classification threshold.
 
     Returns:
-        list: Binary predictions (0 or 1)
+        np.array: Binary predictions (0 or 1)
     """
-    return [1 if p >= threshold else 0 for p in predicted]
+    return (np.asarray(predicted).reshape(-1) >= threshold).astype(int)
 
 
 def get_confusion_matrix(actual, predicted, threshold=0.5):
@@ -34,11 +37,12 @@ def get_confusion_matrix(actual, predicted, threshold=0.5):
     Returns:
         tuple: (TP, FP, TN, FN)
     """
+    actual = np.asarray(actual).reshape(-1)
     predicted_classes = pred_to_classes(predicted, threshold)
-    tp = sum((a == 1 and p == 1) for a, p in zip(actual, predicted_classes))
-    fp = sum((a == 0 and p == 1) for a, p in zip(actual, predicted_classes))
-    tn = sum((a == 0 and p == 0) for a, p in zip(actual, predicted_classes))
-    fn = sum((a == 1 and p == 0) for a, p in zip(actual, predicted_classes))
+    tp = int(np.sum((actual == 1) & (predicted_classes == 1)))
+    fp = int(np.sum((actual == 0) & (predicted_classes == 1)))
+    tn = int(np.sum((actual == 0) & (predicted_classes == 0)))
+    fn = int(np.sum((actual == 1) & (predicted_classes == 0)))
     return tp, fp, tn, fn
 
 
@@ -46,8 +50,8 @@ def get_accuracy(actual, predicted, threshold=0.5):
     """
     Accuracy = (TP + TN) / Total
     """
-    predicted_classes = pred_to_classes(predicted, threshold)
-    correct = sum([a == p for a, p in zip(actual, predicted_classes)])
+    actual = np.asarray(actual).reshape(-1)
+    correct = int(np.sum(actual == pred_to_classes(predicted, threshold)))
     return correct / len(actual)
 
 
@@ -135,3 +139,56 @@ def evaluate_metrics(actual, predicted, threshold=0.5):
         "auprc": auprc(actual, predicted),
         "mse": get_mse(actual, predicted)
     }
+
+
+class MetricAccumulator:
+    """
+    Collects an epoch of predictions on the compute device for one `evaluate_metrics` call.
+
+    Scores and labels are copied into preallocated device buffers (doubled if an epoch
+    outgrows them) and the loss is summed on the device, so batches never wait for a
+    device-to-host transfer; everything is moved to the host once, in `compute`.
+
+    Args:
+        capacity (int): Expected number of samples per epoch.
+        device (torch.device or str): Device of the model outputs.
+    """
+
+    def __init__(self, capacity, device="cpu"):
+        self.scores = torch.empty(max(1, capacity), dtype=torch.float32, device=device)
+        self.labels = torch.empty(max(1, capacity), dtype=torch.int8, device=device)
+        self.loss_sum = torch.zeros((), dtype=torch.float64, device=device)
+        self.n = 0
+
+    def reset(self):
+        """
+        Start a new epoch; the (possibly grown) buffers are kept and reused.
+        """
+        self.loss_sum.zero_()
+        self.n = 0
+
+    def update(self, scores, labels, loss=None):
+        """
+        Add a batch of class-1 scores and labels, and optionally its mean loss.
+        """
+        scores = scores.detach().reshape(-1)
+        end = self.n + len(scores)
+        if end > len(self.scores):
+            size = max(end, 2 * len(self.scores))
+            self.scores = torch.cat((self.scores[:self.n], self.scores.new_empty(size - self.n)))
+            self.labels = torch.cat((self.labels[:self.n], self.labels.new_empty(size - self.n)))
+        self.scores[self.n:end].copy_(scores, non_blocking=True)
+        self.labels[self.n:end].copy_(labels.detach().reshape(-1), non_blocking=True)
+        if loss is not None:
+            self.loss_sum += loss.detach() * len(scores)
+        self.n = end
+
+    def compute(self, threshold=0.5):
+        """
+        `evaluate_metrics` of everything added since the last reset, plus the mean "loss".
+        """
+        scores = self.scores[:self.n].cpu().numpy()
+        labels = self.labels[:self.n].cpu().numpy()
+        metrics = evaluate_metrics(labels, scores, threshold)
+        metrics["loss"] = self.loss_sum.item() / max(1, self.n)
+        return metrics
@@ -11,6 +11,32 @@ Author: Kiana Seraj
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from constants import FEATURE_BLOCKS, resolve_feature_set
+
+
+def fold_batchnorm(linear, bn):
+    """
+    Fold an eval-mode BatchNorm1d into the preceding Linear layer.
+
+    Returns:
+        tuple: (weight (out, in), bias (out,)) such that x @ weight.T + bias == bn(linear(x))
+    """
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    weight = linear.weight * scale[:, None]
+    bias = (linear.bias - bn.running_mean) * scale + bn.bias
+    return weight.detach(), bias.detach()
+
+
+def to_single_logit(state_dict):
+    """
+    Convert a two-output `FC` state dict to the `single_logit` layout by keeping the
+    class-1 output unit; the class-1 probability is unchanged.
+    """
+    state_dict = dict(state_dict)
+    if state_dict["out.weight"].shape[0] == 2:
+        state_dict["out.weight"] = state_dict["out.weight"][1:].clone()
+        state_dict["out.bias"] = state_dict["out.bias"][1:].clone()
+    return state_dict
 
 
 class FC(nn.Module):
@@ -22,16 +48,47 @@ class FC(nn.Module):
         - Combined: FC + LeakyReLU + Dropout + Output
 
     Output:
-        - 2D tensor (binary classification via Sigmoid)
+        - 2D tensor (binary classification via Sigmoid): (B, 2) class probabilities, or
+          (B, 1) class-1 probability with `single_logit=True`. The class-1 score is the
+          last column in both layouts.
+
+    With `single_logit=True` the output layer has one unit; `logits` returns its raw
+    value for training with `nn.BCEWithLogitsLoss`. Two-output checkpoints keep their
+    layout and also work with `logits` (the class-1 unit before the sigmoid).
+
+    In eval mode with `stacked=True` and gradients disabled (`torch.no_grad()` or
+    `torch.inference_mode()`), the BatchNorm layers are folded into the linear layers
+    and both towers run as one batched matmul per layer over stacked weights (one
+    concatenated-batch matmul for shared towers). The folded weights are cached and
+    rebuilt whenever a tower parameter or BatchNorm buffer is replaced or edited in
+    place (checked through the tensors' version counters). Training and forwards with
+    gradients enabled run the layer-by-layer path. Parameter names are the same in
+    every mode, so existing checkpoints load unchanged.
+
+    Args:
+        feature_set (iterable or None): Feature blocks of the input vectors (names from
+            `FEATURE_BLOCKS`, "soc" for both SOC blocks). None means the full 1164-dim vector.
+        normalizer (nn.Module or None): Optional first layer applied to both inputs, e.g. a
+            `FeatureNormalizer` fitted on the feature store (saved with the model weights).
+        shared_towers (bool): Siamese variant: both proteins go through the protein-1 tower.
+        stacked (bool): Use the stacked single-pass tower execution in eval mode.
+        single_logit (bool): One output unit (class-1 logit) instead of two.
     """
 
-    def __init__(self):
+    def __init__(self, feature_set=None, normalizer=None, shared_towers=False, stacked=True, single_logit=False):
         super(FC, self).__init__()
+        self.normalizer = normalizer
+        self.shared_towers = shared_towers
+        self.single_logit = single_logit
+        self.stacked = stacked
+        self._folded = None
 
-        # Input size is 1164 for each protein (based on features)
+        # Input size is 1164 for each protein with all feature blocks
+        self.feature_set = resolve_feature_set(feature_set)
+        self.input_dim = sum(FEATURE_BLOCKS[b] for b in self.feature_set)
 
         # Protein 1
-        self.pro1_fc1 = nn.Linear(1164, 512)
+        self.pro1_fc1 = nn.Linear(self.input_dim, 512)
         self.pro1_bn1 = nn.BatchNorm1d(512)
         self.pro1_fc2 = nn.Linear(512, 256)
         self.pro1_bn2 = nn.BatchNorm1d(256)
@@ -39,69 +96,185 @@ class FC(nn.Module):
         self.pro1_bn3 = nn.BatchNorm1d(128)
 
         # Protein 2
-        self.pro2_fc1 = nn.Linear(1164, 512)
-        self.pro2_bn1 = nn.BatchNorm1d(512)
-        self.pro2_fc2 = nn.Linear(512, 256)
-        self.pro2_bn2 = nn.BatchNorm1d(256)
-        self.pro2_fc3 = nn.Linear(256, 128)
-        self.pro2_bn3 = nn.BatchNorm1d(128)
+        if not shared_towers:
+            self.pro2_fc1 = nn.Linear(self.input_dim, 512)
+            self.pro2_bn1 = nn.BatchNorm1d(512)
+            self.pro2_fc2 = nn.Linear(512, 256)
+            self.pro2_bn2 = nn.BatchNorm1d(256)
+            self.pro2_fc3 = nn.Linear(256, 128)
+            self.pro2_bn3 = nn.BatchNorm1d(128)
 
         # Combined layer
         self.fc1 = nn.Linear(256, 128)
-        self.out = nn.Linear(128, 2)
+        self.out = nn.Linear(128, 1 if single_logit else 2)
 
         # Activation & dropout
         self.relu = nn.LeakyReLU()
         self.sigmoid = nn.Sigmoid()
         self.dropout = nn.Dropout(0.2)
 
-    def forward(self, pro1_data, pro2_data):
+    def tower_layers(self, tower):
         """
-        Forward pass for two protein input embeddings.
+        [(Linear, BatchNorm1d)] x 3 of tower 1 or 2 (tower 1 for both with shared towers).
+        """
+        prefix = "pro1" if tower == 1 or self.shared_towers else "pro2"
+        return [(getattr(self, f"{prefix}_fc{i}"), getattr(self, f"{prefix}_bn{i}")) for i in (1, 2, 3)]
+
+    def _tower(self, x, tower):
+        for fc, bn in self.tower_layers(tower):
+            x = self.dropout(self.relu(bn(fc(x))))
+        return x
+
+    def invalidate(self):
+        """
+        Drop the cached folded weights (rebuilt on the next stacked eval pass). Only
+        needed after writing to a tower tensor's `.data`, which bypasses its version counter.
+        """
+        self._folded = None
+
+    def _use_stacked(self):
+        # The folded weights are detached, so they are only used when no gradient is needed
+        return self.stacked and not self.training and not torch.is_grad_enabled()
+
+    def _fold_key(self):
+        """
+        Identity and version of every tensor the folded weights are computed from.
+        """
+        towers = [1] if self.shared_towers else [1, 2]
+        tensors = [t for tower in towers for fc, bn in self.tower_layers(tower)
+                   for t in (fc.weight, fc.bias, bn.weight, bn.bias, bn.running_mean, bn.running_var)]
+        return tuple((t.data_ptr(), t.dtype, t._version) for t in tensors)
+
+    def _stacked_weights(self):
+        """
+        Per layer: (weights (T, in, out), biases (T, 1, out)) with BatchNorm folded in,
+        T = 1 for shared towers else 2. Cached until a tower tensor changes.
+        """
+        key = self._fold_key()
+        if self._folded is None or self._folded[0] != key:
+            towers = [1] if self.shared_towers else [1, 2]
+            layers = zip(*[self.tower_layers(t) for t in towers])
+            folded_layers = []
+            for pairs in layers:
+                folded = [fold_batchnorm(fc, bn) for fc, bn in pairs]
+                folded_layers.append((
+                    torch.stack([w.t() for w, _ in folded]).contiguous(),
+                    torch.stack([b for _, b in folded])[:, None, :],
+                ))
+            self._folded = (key, folded_layers)
+        return self._folded[1]
+
+    def towers(self, x1, x2):
+        """
+        Run protein 1 through tower 1 and protein 2 through tower 2.
+
+        Returns:
+            tuple: (embedding1 (B1, 128), embedding2 (B2, 128))
+        """
+        if not self._use_stacked():
+            if self.shared_towers:
+                x = self._tower(torch.cat((x1, x2), dim=0), 1)
+                return x[:len(x1)], x[len(x1):]
+            return self._tower(x1, 1), self._tower(x2, 2)
+
+        slope = self.relu.negative_slope
+        if self.shared_towers:
+            x = torch.cat((x1, x2), dim=0)
+            for weight, bias in self._stacked_weights():
+                x = F.leaky_relu(torch.addmm(bias[0], x, weight[0]), slope)
+            return x[:len(x1)], x[len(x1):]
+        if x1.shape != x2.shape:
+            for weight, bias in self._stacked_weights():
+                x1 = F.leaky_relu(torch.addmm(bias[0], x1, weight[0]), slope)
+                x2 = F.leaky_relu(torch.addmm(bias[1], x2, weight[1]), slope)
+            return x1, x2
+        x = torch.stack((x1, x2))
+        for weight, bias in self._stacked_weights():
+            x = F.leaky_relu(torch.baddbmm(bias, x, weight), slope)
+        return x[0], x[1]
+
+    def encode(self, x, tower=1):
+        """
+        Embed proteins with one tower (normalizer included), e.g. to cache embeddings
+        for scoring many pairs with `head`.
 
         Args:
-            pro1_data (Tensor): Feature vector for protein 1.
-            pro2_data (Tensor): Feature vector for protein 2.
+            x (Tensor): (B, input_dim) protein feature vectors.
+            tower (int): 1 for the protein-1 side of a pair, 2 for the protein-2 side.
+
+        Returns:
+            Tensor: (B, 128) embeddings.
+        """
+        if self.normalizer is not None:
+            x = self.normalizer(x)
+        if not self._use_stacked():
+            return self._tower(x, tower)
+        t = 0 if tower == 1 or self.shared_towers else 1
+        for weight, bias in self._stacked_weights():
+            x = F.leaky_relu(torch.addmm(bias[t], x, weight[t]), self.relu.negative_slope)
+        return x
+
+    def head_logits(self, x1, x2):
+        """
+        Output layer of pairs of tower embeddings, before the sigmoid.
+
+        The output layer always runs in fp32, also under bf16 autocast, so logits are not
+        rounded to bf16.
 
         Returns:
-            Tensor: Output prediction of shape (batch_size, 2)
-        """
-        # Protein 1 path
-        x1 = self.pro1_fc1(pro1_data)
-        x1 = self.pro1_bn1(x1)
-        x1 = self.relu(x1)
-        x1 = self.dropout(x1)
-
-        x1 = self.pro1_fc2(x1)
-        x1 = self.pro1_bn2(x1)
-        x1 = self.relu(x1)
-        x1 = self.dropout(x1)
-
-        x1 = self.pro1_fc3(x1)
-        x1 = self.pro1_bn3(x1)
-        x1 = self.relu(x1)
-        x1 = self.dropout(x1)
-
-        # Protein 2 path
-        x2 = self.pro2_fc1(pro2_data)
-        x2 = self.pro2_bn1(x2)
-        x2 = self.relu(x2)
-        x2 = self.dropout(x2)
-
-        x2 = self.pro2_fc2(x2)
-        x2 = self.pro2_bn2(x2)
-        x2 = self.relu(x2)
-        x2 = self.dropout(x2)
-
-        x2 = self.pro2_fc3(x2)
-        x2 = self.pro2_bn3(x2)
-        x2 = self.relu(x2)
-        x2 = self.dropout(x2)
-
-        # Merge
+            Tensor: (batch_size, 2), or (batch_size, 1) with `single_logit`
+        """
         x = torch.cat((x1, x2), dim=1)
         x = self.fc1(x)
         x = self.relu(x)
         x = self.dropout(x)
-        x = self.out(x)
-        return self.sigmoid(x)
+        with torch.autocast(x.device.type, enabled=False):
+            return self.out(x.float())
+
+    def head(self, x1, x2):
+        """
+        Score pairs of tower embeddings.
+
+        Returns:
+            Tensor: Output prediction of shape (batch_size, 2), or (batch_size, 1) with `single_logit`
+        """
+        return self.sigmoid(self.head_logits(x1, x2))
+
+    def logits(self, pro1_data, pro2_data):
+        """
+        Class-1 logits, for `nn.BCEWithLogitsLoss`. Under bf16 autocast the towers and
+        `fc1` run in bf16 and the output layer in fp32 (see `head_logits`).
+
+        Returns:
+            Tensor: (batch_size,) logits
+        """
+        if self.normalizer is not None:
+            pro1_data = self.normalizer(pro1_data)
+            pro2_data = self.normalizer(pro2_data)
+        x1, x2 = self.towers(pro1_data, pro2_data)
+        return self.head_logits(x1, x2)[:, -1]
+
+    def forward(self, pro1_data, pro2_data, symmetric=False):
+        """
+        Forward pass for two protein input embeddings.
+
+        Args:
+            pro1_data (Tensor): Feature vector for protein 1.
+            pro2_data (Tensor): Feature vector for protein 2.
+            symmetric (bool): Average the scores of (a, b) and (b, a), computed in the same pass.
+
+        Returns:
+            Tensor: Output prediction of shape (batch_size, 2), or (batch_size, 1) with `single_logit`
+        """
+        if self.normalizer is not None:
+            pro1_data = self.normalizer(pro1_data)
+            pro2_data = self.normalizer(pro2_data)
+
+        if symmetric:
+            n = len(pro1_data)
+            x1, x2 = self.towers(torch.cat((pro1_data, pro2_data)), torch.cat((pro2_data, pro1_data)))
+            y = self.head(x1, x2)
+            return (y[:n] + y[n:]) / 2
+
+        x1, x2 = self.towers(pro1_data, pro2_data)
+        return self.head(x1, x2)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+normalizer.py
+
+Dataset-level feature normalization: per-feature statistics fitted over a whole feature
+store in one streaming pass, saved alongside the store, and applied to batches as a
+single fused tensor op (or as the first layer of the model).
+
+Author: Kiana Seraj
+"""
+
+import json
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+from feature_store import FeatureStore, NORMALIZER_FILE
+
+NORMALIZER_MODES = ("standard", "minmax")
+
+
+class FeatureNormalizer(nn.Module):
+    """
+    Affine per-feature normalization y = (x - shift) * scale.
+
+    Modes:
+        - "standard": shift = mean, scale = 1 / std (zero mean, unit variance)
+        - "minmax":   shift = min,  scale = 1 / (max - min) (range [0, 1])
+
+    Constant features get scale 1, so they map to 0 instead of dividing by zero.
+    `shift` and `scale` are buffers: they move with `.to(device)` and are saved in
+    the state dict of a model that holds the normalizer.
+
+    Args:
+        shift (array-like): Per-feature shift.
+        scale (array-like): Per-feature scale.
+        mode (str): Mode the statistics were fitted with.
+    """
+
+    def __init__(self, shift, scale, mode="standard"):
+        super(FeatureNormalizer, self).__init__()
+        self.mode = mode
+        self.register_buffer("shift", torch.as_tensor(np.asarray(shift), dtype=torch.float32))
+        self.register_buffer("scale", torch.as_tensor(np.asarray(scale), dtype=torch.float32))
+
+    @classmethod
+    def fit(cls, store, mode="standard", chunk_rows=65536):
+        """
+        Fit the per-feature statistics over every row of a feature store.
+
+        Rows are read in chunks of `chunk_rows` from the memory map and merged with
+        Chan's parallel update, so memory stays bounded by one chunk.
+
+        Args:
+            store (FeatureStore or str): Feature store or its directory.
+            mode (str): "standard" or "minmax".
+            chunk_rows (int): Number of rows read at a time.
+
+        Returns:
+            FeatureNormalizer: Fitted normalizer.
+        """
+        if mode not in NORMALIZER_MODES:
+            raise ValueError(f"Unknown normalizer mode {mode!r}, expected one of {NORMALIZER_MODES}")
+        if not isinstance(store, FeatureStore):
+            store = FeatureStore(store)
+        if store.matrix.shape[0] == 0:
+            raise ValueError(f"Cannot fit a normalizer on the empty feature store {store.path}")
+
+        count = 0
+        mean = np.zeros(store.dim)
+        m2 = np.zeros(store.dim)
+        minimum = np.full(store.dim, np.inf)
+        maximum = np.full(store.dim, -np.inf)
+        for start in range(0, store.matrix.shape[0], chunk_rows):
+            chunk = np.asarray(store.matrix[start:start + chunk_rows], dtype=np.float64)
+            n = chunk.shape[0]
+            chunk_mean = chunk.mean(axis=0)
+            delta = chunk_mean - mean
+            m2 += ((chunk - chunk_mean) ** 2).sum(axis=0) + delta ** 2 * count * n / (count + n)
+            mean += delta * n / (count + n)
+            count += n
+            minimum = np.minimum(minimum, chunk.min(axis=0))
+            maximum = np.maximum(maximum, chunk.max(axis=0))
+
+        if mode == "standard":
+            shift, spread = mean, np.sqrt(m2 / count)
+        else:
+            shift, spread = minimum, maximum - minimum
+        scale = np.divide(1.0, spread, out=np.ones_like(spread), where=spread > 0)
+        return cls(shift, scale, mode)
+
+    def forward(self, x):
+        return (x - self.shift) * self.scale
+
+    def save(self, path):
+        """
+        Save the statistics as JSON, to `path` or to `<store dir>/normalizer.json`.
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, NORMALIZER_FILE)
+        with open(path, "w") as f:
+            json.dump({"mode": self.mode, "shift": self.shift.tolist(), "scale": self.scale.tolist()}, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load statistics saved by `save` (a JSON file or a store directory holding one).
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, NORMALIZER_FILE)
+        with open(path) as f:
+            info = json.load(f)
+        return cls(info["shift"], info["scale"], info["mode"])
+
+    @staticmethod
+    def exists(path):
+        """
+        True if a store directory holds a saved normalizer.
+        """
+        return os.path.exists(os.path.join(path, NORMALIZER_FILE))
+
+
+def fit_store_normalizer(store_dir, mode="standard", chunk_rows=65536):
+    """
+    Fit a normalizer over a feature store and save it alongside the store.
+
+    Returns:
+        FeatureNormalizer: Fitted normalizer.
+    """
+    normalizer = FeatureNormalizer.fit(store_dir, mode, chunk_rows)
+    normalizer.save(store_dir)
+    return normalizer
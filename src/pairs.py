@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+pairs.py
+
+Compact integer-encoded storage of protein-protein interaction pairs.
+
+A pair table is a `.npy` array of `PAIR_DTYPE` records (int32 protein codes plus an
+int8 label, 9 bytes per pair) that can be memory-mapped, instead of an object array of
+ID strings. Codes index a protein ID vocabulary shared by all pair tables of a dataset
+(train/validation/test/negatives), saved as a JSON list.
+
+Run using: python pairs.py vocab.json train.npy val.npy   (writes train.pairs.npy, ...)
+
+Author: Kiana Seraj
+"""
+
+import argparse
+import json
+import os
+import numpy as np
+
+PAIR_DTYPE = np.dtype([("prot_1", np.int32), ("prot_2", np.int32), ("label", np.int8)])
+
+
+class ProteinVocab:
+    """
+    Bidirectional protein ID <-> int32 code mapping.
+
+    Args:
+        ids (iterable or None): Protein IDs in code order.
+    """
+
+    def __init__(self, ids=None):
+        self.ids = []
+        self.index = {}
+        for protein_id in ids or []:
+            self.add(protein_id)
+
+    def add(self, protein_id):
+        """
+        Code of `protein_id`, assigning the next free code to a new ID.
+        """
+        code = self.index.get(protein_id)
+        if code is None:
+            code = self.index[protein_id] = len(self.ids)
+            self.ids.append(protein_id)
+        return code
+
+    def encode(self, protein_ids, grow=True):
+        """
+        int32 codes of `protein_ids`.
+
+        Args:
+            protein_ids (iterable): Protein IDs.
+            grow (bool): Add unknown IDs to the vocabulary; if False, unknown IDs raise KeyError.
+        """
+        protein_ids = np.asarray(protein_ids).astype(str)
+        unique, inverse = np.unique(protein_ids, return_inverse=True)
+        codes = np.array([self.add(p) if grow else self.index[p] for p in unique.tolist()], dtype=np.int32)
+        return codes[inverse.reshape(-1)] if len(unique) else np.zeros(0, dtype=np.int32)
+
+    def decode(self, codes):
+        """
+        Protein IDs of `codes`.
+        """
+        return [self.ids[c] for c in np.asarray(codes).tolist()]
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.ids, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __contains__(self, protein_id):
+        return protein_id in self.index
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def encode_pairs(data_file, vocab, grow=True):
+    """
+    Convert a [protein_id_1, protein_id_2, label] object array into a `PAIR_DTYPE` array.
+
+    Args:
+        data_file (np.array): Pair array in the original `.npy` layout.
+        vocab (ProteinVocab): Shared vocabulary (extended with new IDs if `grow`).
+        grow (bool): Add unknown protein IDs to `vocab`.
+
+    Returns:
+        np.array: (N,) `PAIR_DTYPE` records.
+    """
+    pairs = np.empty(data_file.shape[0], dtype=PAIR_DTYPE)
+    pairs["prot_1"] = vocab.encode(data_file[:, 0], grow)
+    pairs["prot_2"] = vocab.encode(data_file[:, 1], grow)
+    pairs["label"] = data_file[:, 2].astype(float).astype(np.int8)
+    return pairs
+
+
+def is_compact(pairs):
+    """
+    True if `pairs` is a `PAIR_DTYPE` array.
+    """
+    return isinstance(pairs, np.ndarray) and pairs.dtype == PAIR_DTYPE
+
+
+def load_pairs(path, mmap=True):
+    """
+    Load a compact pair table, memory-mapped read-only by default (shared, not copied,
+    by forked DataLoader workers).
+    """
+    pairs = np.load(path, mmap_mode="r" if mmap else None)
+    if pairs.dtype != PAIR_DTYPE:
+        raise ValueError(f"{path} is not a compact pair table (dtype {pairs.dtype})")
+    return pairs
+
+
+def convert_pair_files(paths, vocab_path):
+    """
+    Convert `.npy` pair files to compact `<name>.pairs.npy` tables with one shared vocabulary.
+
+    An existing vocabulary at `vocab_path` is extended, so codes stay stable across runs.
+
+    Returns:
+        list: Paths of the written pair tables.
+    """
+    vocab = ProteinVocab.load(vocab_path) if os.path.exists(vocab_path) else ProteinVocab()
+    outputs = []
+    for path in paths:
+        pairs = encode_pairs(np.load(path, allow_pickle=True), vocab)
+        output = f"{os.path.splitext(path)[0]}.pairs.npy"
+        np.save(output, pairs)
+        outputs.append(output)
+    vocab.save(vocab_path)
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert .npy pair files to compact int32/int8 pair tables")
+    parser.add_argument("vocab", help="Shared protein ID vocabulary (JSON, created or extended)")
+    parser.add_argument("pair_files", nargs="+", help="Pair .npy files [protein_id_1, protein_id_2, label]")
+    args = parser.parse_args()
+    for output in convert_pair_files(args.pair_files, args.vocab):
+        print(f"[Pairs] wrote {output}")
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+profiling.py
+
+Opt-in timing of the feature extraction pipeline: wall time per descriptor stage,
+sequences/sec and residues/sec, and the slowest proteins of a run.
+
+Author: Kiana Seraj
+"""
+
+import heapq
+import json
+import time
+
+
+class ExtractionProfile:
+    """
+    Aggregates per-protein stage timings reported by `protein_features`.
+
+    Stage times are summed over all workers, so with several worker processes
+    their total can exceed the wall time of the run.
+
+    Args:
+        top_n (int): Number of slowest proteins to keep.
+    """
+
+    def __init__(self, top_n: int = 10):
+        self.top_n = top_n
+        self.stage_seconds = {}
+        self.n_sequences = 0
+        self.n_residues = 0
+        self._slowest = []  # min-heap of (seconds, protname, length)
+        self._start = time.perf_counter()
+
+    def add(self, protname, length, timings):
+        """
+        Record the stage timings (stage -> seconds) of one computed protein.
+        """
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.n_sequences += 1
+        self.n_residues += length
+
+        entry = (sum(timings.values()), protname, length)
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def summary(self):
+        """
+        Structured summary of the run so far.
+
+        Returns:
+            dict: JSON-serializable timing summary.
+        """
+        wall = time.perf_counter() - self._start
+        total = sum(self.stage_seconds.values())
+        return {
+            "wall_seconds": wall,
+            "sequences": self.n_sequences,
+            "residues": self.n_residues,
+            "sequences_per_second": self.n_sequences / wall if wall > 0 else 0.0,
+            "residues_per_second": self.n_residues / wall if wall > 0 else 0.0,
+            "stages": {
+                stage: {
+                    "seconds": seconds,
+                    "fraction": seconds / total if total > 0 else 0.0,
+                    "ms_per_sequence": 1000 * seconds / self.n_sequences if self.n_sequences else 0.0,
+                }
+                for stage, seconds in self.stage_seconds.items()
+            },
+            "slowest": [
+                {"protein": protname, "length": length, "seconds": seconds}
+                for seconds, protname, length in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+    def write(self, path):
+        """
+        Write the summary as JSON and return it.
+        """
+        summary = self.summary()
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+quantization.py
+
+Int8 dynamic-quantized CPU inference for a trained `FC`:
+- BatchNorm folded into the Linear layers (see export.py), Dropout removed
+- every Linear quantized to int8 weights with `torch.ao.quantization.quantize_dynamic`
+  (activations are quantized on the fly, per batch)
+- compared with the fp32 model on a held-out set: throughput, parameter size and the
+  `evaluate_metrics` deltas; the artifact is only saved if AUROC and MCC stay within
+  the given tolerances
+
+Run using: python quantization.py model.pt PATH/to/features held_out.npy model_int8.pt
+
+Author: Kiana Seraj
+"""
+
+import argparse
+import copy
+import io
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from export import LinearInferenceFC
+from metrics import evaluate_metrics
+
+GUARDED_METRICS = ("auroc", "mcc")
+
+
+def quantize_fc(model):
+    """
+    Folded, dynamic int8-quantized copy of `model` (CPU only), same inputs and outputs.
+    `model` itself is left unchanged.
+    """
+    folded = LinearInferenceFC(copy.deepcopy(model).cpu()).eval()
+    return torch.ao.quantization.quantize_dynamic(folded, {nn.Linear}, dtype=torch.qint8)
+
+
+def predict(module, pro1_data, pro2_data, batch_size=4096):
+    """
+    (N,) class-1 probabilities of `module` on (N, dim) input pairs.
+    """
+    scores = []
+    with torch.no_grad():
+        for start in range(0, len(pro1_data), batch_size):
+            stop = start + batch_size
+            scores.append(module(pro1_data[start:stop], pro2_data[start:stop])[:, -1])
+    return torch.cat(scores)
+
+
+def throughput(module, pro1_data, pro2_data, batch_size=4096, min_seconds=0.5):
+    """
+    Pairs per second of `module` on the given inputs (repeated for at least `min_seconds`).
+    """
+    predict(module, pro1_data[:batch_size], pro2_data[:batch_size], batch_size)  # warm-up
+    n, start = 0, time.perf_counter()
+    while True:
+        predict(module, pro1_data, pro2_data, batch_size)
+        n += len(pro1_data)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return n / elapsed
+
+
+def state_size(module):
+    """
+    Serialized size of `module`'s state dict, in bytes.
+    """
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell()
+
+
+def quantize_model(model, pro1_data, pro2_data, labels, path=None, max_auroc_drop=0.005,
+                   max_mcc_drop=0.01, threshold=0.5, batch_size=4096, min_seconds=0.5):
+    """
+    Quantize `model` and check it against the fp32 model on a held-out set. Both run
+    on CPU copies; `model` itself (device, training mode) is left unchanged.
+
+    Args:
+        model (FC): Trained model.
+        pro1_data, pro2_data (Tensor): (N, dim) held-out input pairs.
+        labels (array-like): (N,) held-out labels (0/1).
+        path (str or None): Where to save the TorchScript int8 artifact if accepted.
+        max_auroc_drop (float): Largest allowed AUROC decrease.
+        max_mcc_drop (float): Largest allowed MCC decrease.
+        threshold (float): Classification threshold of `evaluate_metrics`.
+        batch_size (int): Pairs per forward call.
+        min_seconds (float): Minimum timing duration per model.
+
+    Returns:
+        tuple: (quantized module, report dict with the fp32/int8 metrics, their deltas
+        (int8 - fp32), pairs/s, speedup and parameter sizes).
+
+    Raises:
+        ValueError: If AUROC or MCC drops by more than its tolerance; nothing is saved.
+    """
+    model = copy.deepcopy(model).cpu().eval()
+    pro1_data = torch.as_tensor(pro1_data, dtype=torch.float32)
+    pro2_data = torch.as_tensor(pro2_data, dtype=torch.float32)
+    labels = np.asarray(labels).astype(int).tolist()
+    quantized = quantize_fc(model)
+
+    fp32_scores = predict(model, pro1_data, pro2_data, batch_size).numpy()
+    int8_scores = predict(quantized, pro1_data, pro2_data, batch_size).numpy()
+    fp32_metrics = evaluate_metrics(labels, fp32_scores, threshold)
+    int8_metrics = evaluate_metrics(labels, int8_scores, threshold)
+    fp32_speed = throughput(model, pro1_data, pro2_data, batch_size, min_seconds)
+    int8_speed = throughput(quantized, pro1_data, pro2_data, batch_size, min_seconds)
+    report = {
+        "fp32": fp32_metrics,
+        "int8": int8_metrics,
+        "delta": {k: float(int8_metrics[k] - fp32_metrics[k]) for k in fp32_metrics},
+        "max_score_diff": float(np.abs(int8_scores - fp32_scores).max()),
+        "fp32_pairs_per_s": fp32_speed,
+        "int8_pairs_per_s": int8_speed,
+        "speedup": int8_speed / fp32_speed,
+        "fp32_bytes": state_size(model),
+        "int8_bytes": state_size(quantized),
+    }
+
+    tolerances = {"auroc": max_auroc_drop, "mcc": max_mcc_drop}
+    failed = [f"{k} {fp32_metrics[k]:.4f} -> {int8_metrics[k]:.4f}"
+              for k in GUARDED_METRICS if fp32_metrics[k] - int8_metrics[k] > tolerances[k]]
+    if failed:
+        raise ValueError(f"Int8 model rejected, metric drop above tolerance: {', '.join(failed)}")
+
+    if path is not None:
+        torch.jit.save(torch.jit.script(quantized), path)
+    return quantized, report
+
+
+if __name__ == "__main__":
+    from data import ProtDataset
+    from inference import load_model
+
+    parser = argparse.ArgumentParser(description="Int8 dynamic quantization of an FC model with metric guardrails")
+    parser.add_argument("checkpoint", help="Model state dict (.pt)")
+    parser.add_argument("feature_dir", help="Feature store or directory of .pt feature vectors")
+    parser.add_argument("held_out", help="Held-out pair file (.npy)")
+    parser.add_argument("output", help="TorchScript int8 artifact path")
+    parser.add_argument("--feature-set", nargs="+", default=None, help="Feature blocks of the model input")
+    parser.add_argument("--shared-towers", action="store_true")
+    parser.add_argument("--max-auroc-drop", type=float, default=0.005)
+    parser.add_argument("--max-mcc-drop", type=float, default=0.01)
+    args = parser.parse_args()
+
+    trained = load_model(args.checkpoint, args.feature_set, args.shared_towers)
+    dataset = ProtDataset(args.feature_dir, np.load(args.held_out, allow_pickle=True), in_memory=True)
+    x1, x2, y = dataset.get_batch(list(range(len(dataset))))
+    _, summary = quantize_model(trained, x1, x2, y.numpy(), args.output, args.max_auroc_drop, args.max_mcc_drop)
+    for name, delta in summary["delta"].items():
+        print(f"[Quantization] {name}: {summary['fp32'][name]:.4f} -> {summary['int8'][name]:.4f} ({delta:+.4f})")
+    print(f"[Quantization] {summary['fp32_pairs_per_s']:.0f} -> {summary['int8_pairs_per_s']:.0f} pairs/s "
+          f"({summary['speedup']:.2f}x), {summary['fp32_bytes'] / 2 ** 20:.1f} -> {summary['int8_bytes'] / 2 ** 20:.1f} MB")
+    print(f"[Quantization] wrote {args.output}")
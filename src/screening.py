@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+screening.py
+
+All-vs-all proteome screening: scores every unordered pair of N proteins of a feature
+store with an `FC` model and keeps the top-k partners of each protein and/or all pairs
+above a score threshold.
+
+- Tower embeddings are computed once per protein. `fc1` is linear in the concatenated
+  embeddings, so it splits into one per-protein term per side; scoring a tile of pairs
+  is then a broadcast add, a LeakyReLU and a dot product with the class-1 output row.
+- Pairs are processed in (rows x columns) tiles sized to a memory budget, using every
+  CPU core through PyTorch's intra-op threads.
+- Per-protein top-k lists are kept in running (N, k) buffers merged with every tile;
+  a protein's list is written as soon as its row of tiles is finished, and threshold
+  hits are written tile by tile.
+
+Run using: python screening.py model.pt PATH/to/feature_store PATH/to/output --top-k 50
+
+Author: Kiana Seraj
+"""
+
+import argparse
+import math
+import os
+import torch
+import torch.nn.functional as F
+from feature_store import FeatureStore
+from inference import load_model
+
+TOPK_FILE = "topk.tsv"
+HITS_FILE = "hits.tsv"
+
+
+def pair_factors(model, features, batch_size=4096):
+    """
+    Per-protein terms of the pair head.
+
+    Returns:
+        tuple: (U (N, 128), V (N, 128)) such that the class-1 score of pair (i, j), with i
+        as protein 1, is sigmoid(w . leaky_relu(U[i] + V[j]) + b).
+    """
+    model.eval()
+    weight, bias = model.fc1.weight, model.fc1.bias
+    w1, w2 = weight[:, :weight.shape[1] // 2], weight[:, weight.shape[1] // 2:]
+    us, vs = [], []
+    with torch.no_grad():
+        for start in range(0, len(features), batch_size):
+            x = torch.as_tensor(features[start:start + batch_size], dtype=torch.float32)
+            us.append(model.encode(x, 1) @ w1.t() + bias)
+            vs.append(model.encode(x, 2) @ w2.t())
+    return torch.cat(us), torch.cat(vs)
+
+
+def tile_scores(model, u, v):
+    """
+    (len(u), len(v)) class-1 probabilities of all (row, column) pairs.
+    """
+    hidden = F.leaky_relu(u[:, None, :] + v[None, :, :], model.relu.negative_slope)
+    return torch.sigmoid(hidden @ model.out.weight[-1] + model.out.bias[-1])
+
+
+def tile_size(memory_mb, symmetric):
+    """
+    Side of a square tile whose (tile, tile, 128) hidden activations fit in `memory_mb`.
+    """
+    bytes_per_pair = 128 * 4 * (2 if symmetric else 1) * 2  # hidden activations + LeakyReLU output
+    return max(1, int(math.sqrt(memory_mb * 2 ** 20 / bytes_per_pair)))
+
+
+def screen_proteome(model, store, output_dir, top_k=50, threshold=None, memory_mb=512,
+                    symmetric=True, protein_ids=None, threads=None):
+    """
+    Score all N(N-1)/2 pairs of a set of proteins.
+
+    Args:
+        model (FC): Trained model.
+        store (FeatureStore or str): Feature store (or its directory) with the proteins.
+        output_dir (str): Directory for `topk.tsv` (protein, rank, partner, score) and
+            `hits.tsv` (protein_1, protein_2, score).
+        top_k (int or None): Partners kept per protein (None or 0 to skip).
+        threshold (float or None): Also write every pair scoring at least this much.
+        memory_mb (float): Memory budget of one tile of pair activations; input vectors are
+            also read in blocks of one tile side. The per-protein terms (2 x N x 128
+            floats) and top-k buffers are held for all N proteins.
+        symmetric (bool): Score a pair as the mean of (a, b) and (b, a); otherwise as
+            (a, b) with a the protein listed first.
+        protein_ids (list or None): Proteins to screen (default: every protein of the store).
+        threads (int or None): PyTorch threads during the screen (default: PyTorch's, one
+            per CPU core); the previous setting is restored afterwards.
+
+    Returns:
+        dict: Number of proteins, pairs scored and threshold hits.
+    """
+    if not top_k and threshold is None:
+        raise ValueError("Nothing to keep: set top_k and/or threshold")
+    previous_threads = torch.get_num_threads()
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        return _screen(model, store, output_dir, top_k, threshold, memory_mb, symmetric, protein_ids)
+    finally:
+        torch.set_num_threads(previous_threads)
+
+
+def _screen(model, store, output_dir, top_k, threshold, memory_mb, symmetric, protein_ids):
+    """
+    Body of `screen_proteome`, run with the requested thread count.
+    """
+    if not isinstance(store, FeatureStore):
+        store = FeatureStore(store)
+    if protein_ids is None:
+        protein_ids = sorted(store.index, key=store.index.get)
+    n = len(protein_ids)
+    top_k = min(top_k or 0, n - 1)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tile = tile_size(memory_mb, symmetric)
+    # Input vectors are read one tile of proteins at a time; only the 128-dim terms are kept
+    factors = [pair_factors(model, store.rows(protein_ids[start:start + tile])) for start in range(0, n, tile)]
+    u = torch.cat([f[0] for f in factors])
+    v = torch.cat([f[1] for f in factors])
+    best_scores = torch.full((n, top_k), -math.inf)
+    best_partners = torch.full((n, top_k), -1, dtype=torch.int64)
+    n_hits = 0
+
+    def merge(rows, scores, columns):
+        # Running top-k of `rows` merged with a (len(rows), len(columns)) block of scores
+        candidates = torch.cat((best_scores[rows], scores), dim=1)
+        partners = torch.cat((best_partners[rows], columns.expand(len(rows), -1)), dim=1)
+        kept, order = torch.topk(candidates, top_k, dim=1)
+        best_scores[rows] = kept
+        best_partners[rows] = partners.gather(1, order)
+
+    with open(os.path.join(output_dir, TOPK_FILE), "w") as topk_file, \
+            open(os.path.join(output_dir, HITS_FILE), "w") as hits_file, torch.no_grad():
+        for i in range(0, n, tile):
+            rows = torch.arange(i, min(i + tile, n))
+            for j in range(i, n, tile):
+                columns = torch.arange(j, min(j + tile, n))
+                scores = tile_scores(model, u[rows], v[columns])
+                if symmetric:
+                    scores = (scores + tile_scores(model, u[columns], v[rows]).t()) / 2
+                if i == j:
+                    # Diagonal tile: each unordered pair once (upper triangle), no self-pairs
+                    upper = torch.triu(torch.ones_like(scores, dtype=torch.bool), diagonal=1)
+                    scores = torch.where(upper, scores, torch.tensor(-math.inf))
+                    full = torch.where(upper, scores, scores.t())
+                    if top_k:
+                        merge(rows, full, columns)
+                elif top_k:
+                    merge(rows, scores, columns)
+                    merge(columns, scores.t(), rows)
+
+                if threshold is not None:
+                    hits = (scores >= threshold).nonzero()
+                    n_hits += len(hits)
+                    hits_file.writelines(
+                        f"{protein_ids[i + a]}\t{protein_ids[j + b]}\t{scores[a, b].item():.6f}\n"
+                        for a, b in hits.tolist()
+                    )
+
+            # Proteins of this row block have now met every partner
+            for r in rows.tolist():
+                for rank, (partner, score) in enumerate(zip(best_partners[r].tolist(), best_scores[r].tolist()), 1):
+                    topk_file.write(f"{protein_ids[r]}\t{rank}\t{protein_ids[partner]}\t{score:.6f}\n")
+            print(f"[Screening] {rows[-1].item() + 1}/{n} proteins done")
+
+    return {"proteins": n, "pairs": n * (n - 1) // 2, "hits": n_hits}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="All-vs-all PPI screening of a feature store")
+    parser.add_argument("checkpoint", help="Model state dict (.pt)")
+    parser.add_argument("store", help="Feature store directory")
+    parser.add_argument("output_dir")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--memory-mb", type=float, default=512)
+    parser.add_argument("--asymmetric", action="store_true", help="Score (a, b) only, not the mean with (b, a)")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    feature_store = FeatureStore(args.store)
+    screen_model = load_model(args.checkpoint, feature_set=list(feature_store.blocks) if feature_store.blocks else None)
+    summary = screen_proteome(screen_model, feature_store, args.output_dir, args.top_k, args.threshold,
+                              args.memory_mb, not args.asymmetric, threads=args.threads)
+    print(f"[Screening] {summary['pairs']} pairs scored, {summary['hits']} above threshold")
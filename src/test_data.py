@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the feature store and ProtDataset.
+Run using: pytest test_data.py
+Author: Kiana Seraj
+"""
+
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from data import NegativeSampledDataset, ProtDataset, ShardedPairDataset, make_loader, write_pair_shards
+from feature_store import FeatureStore, FeatureStoreWriter
+from model import FC
+from normalizer import FeatureNormalizer, fit_store_normalizer
+from pairs import PAIR_DTYPE, ProteinVocab, convert_pair_files, load_pairs
+
+PAIRS = np.array([["P0", "P1", "1"], ["P1", "P2", "0"], ["P2", "P0", "1.0"]], dtype=object)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return {f"P{i}": rng.random(8) for i in range(3)}
+
+
+def write_store(path, vectors):
+    """
+    Write one store row per protein of `vectors` and return the store directory.
+    """
+    with FeatureStoreWriter(str(path), 8) as writer:
+        for name, features in vectors.items():
+            writer.add(features, [name])
+    return str(path)
+
+
+def test_feature_store_roundtrip(tmp_path, vectors):
+    with FeatureStoreWriter(str(tmp_path), 8, metadata={"note": "test"}) as writer:
+        for name, features in vectors.items():
+            writer.add(features, [name])
+        writer.add(vectors["P0"], ["P0_isoform", "P0_dup"])
+
+    store = FeatureStore(str(tmp_path))
+    assert len(store) == 5 and store.metadata == {"note": "test"}
+    assert store.matrix.shape == (4, 8)
+    assert (store.row("P1") == vectors["P1"].astype(np.float32)).all()
+    assert (store.rows(["P0_dup", "P2"]) == np.stack([vectors["P0"], vectors["P2"]]).astype(np.float32)).all()
+
+
+def test_unfinished_store_is_not_readable(tmp_path, vectors):
+    with pytest.raises(RuntimeError):
+        with FeatureStoreWriter(str(tmp_path), 8) as writer:
+            writer.add(vectors["P0"], ["P0"])
+            raise RuntimeError
+    assert not FeatureStore.is_store(str(tmp_path))
+
+
+def test_dataset_store_matches_pt_files(tmp_path, vectors):
+    (tmp_path / "pt").mkdir()
+    write_store(tmp_path / "store", vectors)
+    for name, features in vectors.items():
+        torch.save(features.astype(np.float32).tolist(), tmp_path / "pt" / f"{name}.pt")
+
+    from_store = ProtDataset(str(tmp_path / "store"), PAIRS)
+    from_pt = ProtDataset(str(tmp_path / "pt"), PAIRS)
+    assert len(from_store) == 3
+    for i in range(3):
+        for a, b in zip(from_store[i], from_pt[i]):
+            assert torch.equal(a, b)
+
+
+def test_normalizer_streaming_fit_matches_full_statistics(tmp_path):
+    rng = np.random.default_rng(1)
+    matrix = rng.normal(5, 3, size=(50, 8)).astype(np.float32)
+    matrix[:, 3] = 2.0  # constant feature
+    with FeatureStoreWriter(str(tmp_path), 8) as writer:
+        for i, row in enumerate(matrix):
+            writer.add(row, [f"P{i}"])
+
+    normalizer = fit_store_normalizer(str(tmp_path), chunk_rows=7)
+    assert FeatureNormalizer.exists(str(tmp_path))
+    x = torch.from_numpy(matrix)
+    y = normalizer(x)
+    assert torch.allclose(y.mean(dim=0), torch.zeros(8), atol=1e-5)
+    assert torch.allclose(y[:, [0, 1, 2, 4, 5, 6, 7]].std(dim=0, unbiased=False), torch.ones(7), atol=1e-4)
+    assert (y[:, 3] == 0).all()
+
+    minmax = FeatureNormalizer.fit(str(tmp_path), mode="minmax", chunk_rows=16)(x)
+    assert minmax.min() == 0 and minmax.max() <= 1 + 1e-6
+
+    loaded = FeatureNormalizer.load(str(tmp_path))
+    assert torch.equal(loaded(x), y)
+
+    # Rewriting the store drops statistics fitted on its previous contents
+    with FeatureStoreWriter(str(tmp_path), 8) as writer:
+        writer.add(matrix[0], ["P0"])
+    assert not FeatureNormalizer.exists(str(tmp_path))
+
+
+def test_model_with_normalizer_layer():
+    normalizer = FeatureNormalizer(np.full(1164, 0.5), np.full(1164, 2.0))
+    model = FC(normalizer=normalizer).eval()
+    plain = FC().eval()
+    plain.load_state_dict({k: v for k, v in model.state_dict().items() if not k.startswith("normalizer.")})
+    x1, x2 = torch.rand(4, 1164), torch.rand(4, 1164)
+    assert "normalizer.shift" in model.state_dict()
+    assert torch.allclose(model(x1, x2), plain((x1 - 0.5) * 2, (x2 - 0.5) * 2))
+
+
+@pytest.mark.parametrize("layout", ["store", "pt"])
+def test_in_memory_table_loads_each_protein_once(tmp_path, vectors, layout, monkeypatch):
+    pairs = np.array([["P0", "P1", "1"], ["P0", "P2", "0"], ["P2", "P0", "1"], ["P0", "P0_dup", "0"]], dtype=object)
+    if layout == "store":
+        with FeatureStoreWriter(str(tmp_path), 8) as writer:
+            writer.add(vectors["P0"], ["P0", "P0_dup"])
+            writer.add(vectors["P1"], ["P1"])
+            writer.add(vectors["P2"], ["P2"])
+    else:
+        for name, features in dict(vectors, P0_dup=vectors["P0"]).items():
+            torch.save(features.astype(np.float32).tolist(), tmp_path / f"{name}.pt")
+
+    lazy = ProtDataset(str(tmp_path), pairs)
+    loads = []
+    real_load = torch.load
+    monkeypatch.setattr(torch, "load", lambda *a, **k: loads.append(a[0]) or real_load(*a, **k))
+    dataset = ProtDataset(str(tmp_path), pairs, in_memory=True)
+    assert len(loads) == (0 if layout == "store" else 4)
+    assert dataset.table.shape == ((3 if layout == "store" else 4), 8)
+
+    for i in range(len(pairs)):
+        for a, b in zip(dataset[i], lazy[i]):
+            assert torch.equal(a, b)
+    prot1, prot2, labels = dataset.get_batch([3, 0, 2])
+    assert prot1.shape == (3, 8) and torch.equal(labels, torch.tensor([0, 1, 1]))
+    assert torch.equal(prot2[0], lazy[3][1]) and torch.equal(prot1[2], lazy[2][0])
+
+
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_batched_loader_matches_per_sample_collate(tmp_path, vectors, in_memory):
+    write_store(tmp_path, vectors)
+    pairs = np.concatenate([PAIRS] * 3)
+    dataset = ProtDataset(str(tmp_path), pairs, in_memory=in_memory)
+
+    batches = list(make_loader(dataset, batch_size=4))
+    reference = list(torch.utils.data.DataLoader(dataset, batch_size=4))
+    assert [b[0].shape for b in batches] == [(4, 8), (4, 8), (1, 8)]
+    for batch, expected in zip(batches, reference):
+        for a, b in zip(batch, expected):
+            assert torch.equal(a, b)
+
+    shuffled = list(make_loader(dataset, batch_size=4, shuffle=True, drop_last=True))
+    assert len(shuffled) == 2 and all(b[0].shape == (4, 8) for b in shuffled)
+
+
+def test_sharded_dataset_streams_every_pair_once(tmp_path, vectors):
+    write_store(tmp_path / "store", vectors)
+    rng = np.random.default_rng(0)
+    pairs = np.array([[f"P{rng.integers(3)}", f"P{rng.integers(3)}", str(i % 2)] for i in range(100)], dtype=object)
+    shards = write_pair_shards(pairs, str(tmp_path / "shards"), shard_size=16)
+    assert len(shards) == 7
+
+    def stream(dataset, **loader_args):
+        return [(tuple(a.tolist()), tuple(b.tolist()), int(c)) for a, b, c in DataLoader(dataset, **loader_args)]
+
+    store = FeatureStore(str(tmp_path / "store"))
+    expected = [(tuple(store.row(a).tolist()), tuple(store.row(b).tolist()), int(c)) for a, b, c in pairs]
+    ordered = ShardedPairDataset(str(tmp_path / "store"), str(tmp_path / "shards"))
+    assert stream(ordered, batch_size=None) == expected
+
+    shuffled = ShardedPairDataset(str(tmp_path / "store"), shards, shuffle=True, buffer_size=10, seed=3)
+    first = stream(shuffled, batch_size=None, num_workers=2)
+    assert first != expected and sorted(first) == sorted(expected)
+    assert stream(shuffled, batch_size=None, num_workers=2) == first
+    shuffled.set_epoch(1)
+    assert stream(shuffled, batch_size=None, num_workers=2) != first
+
+    batched = ShardedPairDataset(str(tmp_path / "store"), shards, batch_size=32)
+    batches = list(DataLoader(batched, batch_size=None))
+    assert [len(b[2]) for b in batches] == [32, 32, 32, 4]
+    assert torch.equal(batches[0][0][5], torch.from_numpy(store.row(pairs[5, 0])))
+
+
+def test_compact_pairs_match_string_pairs(tmp_path, vectors):
+    write_store(tmp_path / "store", vectors)
+    np.save(tmp_path / "train.npy", PAIRS)
+    np.save(tmp_path / "val.npy", np.array([["P2", "P1", "0.0"]], dtype=object))
+    train_path, val_path = convert_pair_files([str(tmp_path / "train.npy"), str(tmp_path / "val.npy")],
+                                              str(tmp_path / "vocab.json"))
+    vocab = ProteinVocab.load(str(tmp_path / "vocab.json"))
+    assert vocab.ids == ["P0", "P1", "P2"]
+
+    train = load_pairs(train_path)
+    assert isinstance(train, np.memmap) and train.dtype == PAIR_DTYPE and train.itemsize == 9
+    assert train["label"].tolist() == [1, 0, 1]
+    assert vocab.decode(load_pairs(val_path)["prot_1"]) == ["P2"]
+
+    # Converting again extends the vocabulary without renumbering
+    np.save(tmp_path / "new.npy", np.array([["P9", "P0", "1"]], dtype=object))
+    convert_pair_files([str(tmp_path / "new.npy")], str(tmp_path / "vocab.json"))
+    assert ProteinVocab.load(str(tmp_path / "vocab.json")).ids == ["P0", "P1", "P2", "P9"]
+
+    with pytest.raises(ValueError):
+        ProtDataset(str(tmp_path / "store"), train)
+    for in_memory in (False, True):
+        compact = ProtDataset(str(tmp_path / "store"), train, in_memory=in_memory, vocab=vocab)
+        strings = ProtDataset(str(tmp_path / "store"), PAIRS, in_memory=in_memory)
+        for i in range(3):
+            for a, b in zip(compact[i], strings[i]):
+                assert torch.equal(a, b)
+
+    shards = str(tmp_path / "shards")
+    write_pair_shards(PAIRS, shards, shard_size=2, vocab=vocab)
+    streamed = list(DataLoader(ShardedPairDataset(str(tmp_path / "store"), shards, vocab=vocab), batch_size=None))
+    assert [int(label) for _, _, label in streamed] == [1, 0, 1]
+    assert torch.equal(streamed[2][1], torch.from_numpy(vectors["P0"].astype(np.float32)))
+    with pytest.raises(ValueError, match="ProteinVocab"):
+        ShardedPairDataset(str(tmp_path / "store"), shards)
+
+
+def test_datasets_share_an_initially_empty_vocab(tmp_path, vectors):
+    write_store(tmp_path, vectors)
+    vocab = ProteinVocab()
+    train = ProtDataset(str(tmp_path), PAIRS, vocab=vocab)
+    val = ProtDataset(str(tmp_path), np.array([["P2", "P1", "0"]], dtype=object), vocab=vocab)
+    assert train.vocab is vocab and val.vocab is vocab
+    assert vocab.ids == ["P0", "P1", "P2"]
+    assert vocab.decode(val.prot_1) == ["P2"]
+
+
+def test_negative_sampler_excludes_positives_and_is_seeded(tmp_path):
+    rng = np.random.default_rng(0)
+    with FeatureStoreWriter(str(tmp_path), 4) as writer:
+        for i in range(30):
+            writer.add(rng.random(4), [f"P{i}"])
+    pairs = np.array([[f"P{i}", f"P{(i * 7 + 1) % 30}", "1"] for i in range(30)]
+                     + [["P0", "P2", "0"]], dtype=object)
+    base = ProtDataset(str(tmp_path), pairs, in_memory=True)
+    known = base.vocab.encode(["P3", "P4"]).reshape(1, 2)
+    dataset = NegativeSampledDataset(base, ratio=2.0, seed=5, known_positives=known)
+    assert len(dataset) == 30 + 60 and int(dataset.labels.sum()) == 30
+
+    negatives = dataset.labels == 0
+    neg_1, neg_2 = dataset.prot_1[negatives], dataset.prot_2[negatives]
+    assert not dataset.is_known_positive(neg_1, neg_2).any() and (neg_1 != neg_2).all()
+    assert dataset.is_known_positive(np.array([known[0, 1]]), np.array([known[0, 0]])).all()
+    assert len(np.unique(np.minimum(neg_1, neg_2) * 100 + np.maximum(neg_1, neg_2))) == 60
+
+    epoch0 = dataset.prot_2.copy()
+    assert (NegativeSampledDataset(base, ratio=2.0, seed=5, known_positives=known).prot_2 == epoch0).all()
+    dataset.set_epoch(1)
+    assert not (dataset.prot_2 == epoch0).all()
+
+    prot1, prot2, labels = next(iter(make_loader(dataset, batch_size=len(dataset))))
+    assert prot1.shape == (90, 4) and labels.sum() == 30
+    assert torch.equal(prot1[0], torch.from_numpy(base.store.row("P0")))
+    assert torch.equal(dataset[40][1], base.features(dataset.prot_2[40:41])[0])
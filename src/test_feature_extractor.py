@@ -1,14 +1,41 @@
 # -*- coding: utf-8 -*-
 """
-Unit tests for feature_extractor module.
+Unit tests for the feature extraction modules (utils, feature_generator).
 Run using: pytest test_feature_extractor.py
 Author: Kiana Seraj
 """
 
+import gzip
+import http.server
+import io
+import json
+import random
+import threading
+
+import numpy as np
 import pytest
-import feature_extractor
+import torch
+import utils as feature_extractor
+import feature_generator
+import benchmark
+from feature_store import FeatureStore
+from model import FC
 
 SEQUENCE = "RKESTPHDQN"  # 10 amino acids
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def random_sequence(rng, length):
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(length))
+
+def write_sequence_dir(tmp_path, sequences):
+    """
+    Save each sequence as `seqs/P<i>.npy` (the layout `extract_features` reads) and return the directory.
+    """
+    sequence_dir = tmp_path / "seqs"
+    sequence_dir.mkdir(exist_ok=True)
+    for i, sequence in enumerate(sequences):
+        np.save(sequence_dir / f"P{i}.npy", np.array(sequence, dtype=object))
+    return sequence_dir
 
 def test_AAC():
     aac = feature_extractor.AAC(SEQUENCE)
@@ -18,7 +45,7 @@ def test_AAC():
 def test_DPC():
     dpc = feature_extractor.DPC(SEQUENCE)
     assert len(dpc) == 400
-    assert abs(sum(dpc) - 1.0) < 1e-6  # DPC should also be normalized
+    assert abs(sum(dpc) - 1.0) < 1e-3  # DPC should also be normalized (protpy rounds each percentage)
 
 def test_hydrophobicity_descriptor():
     encoding = feature_extractor.hydrophobicity_descriptor(SEQUENCE)
@@ -44,8 +71,21 @@ def test_distribution_descriptor():
     assert len(dist) == 15
     assert all(0.0 <= d <= 1.0 for d in dist)
 
+@pytest.mark.parametrize("encoding", ["1", "2", "12", "121", "3332", "1231231", "2322323", "111", "12" * 500])
+def test_string_descriptors_match_reference(encoding):
+    assert feature_extractor.transition_descriptor(encoding) == benchmark.reference_transition(encoding)
+    assert feature_extractor.distribution_descriptor(encoding) == benchmark.reference_distribution(encoding)
+
+def test_string_descriptors_match_reference_on_titin_length():
+    rng = random.Random(35000)
+    encoding = "".join(rng.choice("123") for _ in range(35000))
+    assert feature_extractor.transition_descriptor(encoding) == benchmark.reference_transition(encoding)
+    assert feature_extractor.distribution_descriptor(encoding) == benchmark.reference_distribution(encoding)
+    positions = [i + 1 for i, char in enumerate(encoding) if char == "2"]
+    assert feature_extractor.calculate_class_lengths(encoding, "2")[::4] == [positions[0], positions[-1]]
+
 def test_APAAC():
-    apaac = feature_extractor.APAAC(SEQUENCE)
+    apaac = feature_generator.APAAC(SEQUENCE * 4)  # APAAC uses lamda=30, needs > 30 residues
     assert isinstance(apaac, list)
     assert len(apaac) == 80
 
@@ -67,3 +107,260 @@ def test_all_property_encodings():
         assert isinstance(encoding, str)
         assert len(encoding) == len(SEQUENCE)
         assert set(encoding).issubset({"1", "2", "3"})
+
+@pytest.mark.parametrize("length", [1, 2, 10, 257, 3000])
+def test_CTD_matches_reference(length):
+    sequence = random_sequence(random.Random(length), length)
+    ctd = feature_generator.CTD(sequence)
+    assert len(ctd) == 504
+    assert ctd == benchmark.reference_ctd(sequence)
+
+def test_CTD_unclassified_and_multiclass_residues():
+    # 'R' has no solvent accessibility class, 'P' has two, 'X' has none anywhere
+    for sequence in ["RRRP", "PPPP", "AXRPXK", SEQUENCE]:
+        assert feature_generator.CTD(sequence) == benchmark.reference_ctd(sequence)
+
+def test_sequence_order_matches_protfeat_layout(tmp_path):
+    sequence = random_sequence(random.Random(0), 120)
+    order = feature_extractor.SEQUENCE_ORDER_AA
+
+    def grantham(a, b):
+        return 0 if a == b else feature_extractor.grantham_distances[tuple(sorted((a, b)))]
+
+    def schneider(a, b):
+        return feature_extractor.schneider_wrede_distances[a][feature_extractor.schneider_wrede_order.index(b)]
+
+    expected_soc = []
+    for dist in (schneider, grantham):
+        for n in range(1, 31):
+            tau = sum(dist(sequence[j], sequence[j + n]) ** 2 for j in range(len(sequence) - n))
+            expected_soc.append(tau / (len(sequence) - n))
+    soc = feature_extractor.sequence_order_coupling_number(sequence)
+    assert soc == pytest.approx(expected_soc, rel=1e-12)
+
+    qso = feature_generator.compute_QSOrder(sequence)
+    assert len(qso) == 100
+    tau_sw = sum(schneider(sequence[j], sequence[j + 1]) ** 2 for j in range(len(sequence) - 1))
+    assert qso[40] == pytest.approx(0.1 * tau_sw / (1 + 0.1 * sum(expected_soc[n] * (len(sequence) - n - 1) for n in range(30))))
+    assert qso[:20] == pytest.approx([sequence.count(aa) / (1 + 0.1 * sum(
+        expected_soc[n] * (len(sequence) - n - 1) for n in range(30))) for aa in order])
+
+    # In-process values match what the file-based loader reads back
+    (tmp_path / "P1_SOCNumber.txt").write_text("P1\t" + "\t".join(repr(v) for v in soc))
+    assert feature_generator.compute_SOCNumber(sequence) == feature_generator.SOCNumber("P1", str(tmp_path))
+
+def test_AAC_DPC_batch_match_protpy():
+    rng = random.Random(3)
+    sequences = [random_sequence(rng, rng.randint(2, 400)) for _ in range(20)]
+    sequences += [SEQUENCE, "AAAA", "AAAC", "aacC"]  # homodipeptide runs are counted non-overlapping
+    aac = feature_extractor.AAC_batch(sequences)
+    dpc = feature_extractor.DPC_batch(sequences)
+    assert aac.shape == (len(sequences), 20) and dpc.shape == (len(sequences), 400)
+    assert (aac == np.array([benchmark.reference_aac(s) for s in sequences])).all()
+    assert (dpc == np.array([benchmark.reference_dpc(s) for s in sequences])).all()
+    assert feature_extractor.AAC(sequences[0]) == benchmark.reference_aac(sequences[0])
+    assert feature_extractor.DPC(sequences[0]) == benchmark.reference_dpc(sequences[0])
+
+def test_extract_features_batches_AAC_DPC(tmp_path):
+    rng = random.Random(9)
+    sequences = [random_sequence(rng, rng.randint(40, 300)) for _ in range(5)]
+    sequences += ["ACDXK" * 10, "M"]  # rejected by the batch: computed (and failing) per protein
+    sequence_dir = write_sequence_dir(tmp_path, sequences)
+
+    errors = feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "out"), batch_size=3)
+    assert sorted(errors) == ["P5", "P6"]
+    for i, sequence in enumerate(sequences[:5]):
+        written = torch.load(tmp_path / "out" / f"P{i}.pt")
+        reference = benchmark.reference_aac(sequence) + benchmark.reference_dpc(sequence)
+        assert written[:420] == reference
+
+def test_extract_features_parallel_isolates_failures(tmp_path):
+    rng = random.Random(4)
+    sequences = [random_sequence(rng, 60) for _ in range(4)]
+    sequences[2] += "X"
+    sequence_dir = write_sequence_dir(tmp_path, sequences)
+
+    errors = feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "par"), workers=2, chunk_size=1)
+    feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "ser"))
+    assert list(errors) == ["P2"]
+    assert (tmp_path / "par" / "extraction_errors.tsv").read_text().startswith("P2\t")
+    for name in ["P0", "P1", "P3"]:
+        par = torch.load(tmp_path / "par" / f"{name}.pt", weights_only=False)
+        assert par == torch.load(tmp_path / "ser" / f"{name}.pt", weights_only=False)
+    assert not (tmp_path / "par" / "P2.pt").exists()
+
+def test_extract_features_cache_reuses_unchanged_and_duplicate_sequences(tmp_path, monkeypatch):
+    rng = random.Random(5)
+    sequences = [random_sequence(rng, 50) for _ in range(3)]
+    sequence_dir = write_sequence_dir(tmp_path, sequences + [sequences[0]])  # P3 duplicates P0
+
+    computed = []
+    protein_features = feature_generator.protein_features
+    monkeypatch.setattr(feature_generator, "protein_features",
+                        lambda seq, *args: computed.append(seq) or protein_features(seq, *args))
+    run = lambda: feature_generator.extract_features(
+        str(sequence_dir), None, str(tmp_path / "out"), cache_dir=str(tmp_path / "cache"))
+
+    run()
+    assert len(computed) == 3
+    assert torch.load(tmp_path / "out" / "P3.pt") == torch.load(tmp_path / "out" / "P0.pt")
+
+    # Only the changed protein is recomputed
+    np.save(sequence_dir / "P1.npy", np.array(sequences[1][::-1], dtype=object))
+    run()
+    assert computed[3:] == [sequences[1][::-1]]
+
+    # Another feature set is cached next to the full one, which stays reusable
+    feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "subset"),
+                                       cache_dir=str(tmp_path / "cache"), feature_set={"aac", "ctd"})
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+    run()
+    assert len(computed) == 4 + 3
+
+    # A truncated entry (killed writer) is treated as a miss and recomputed
+    entry = next((tmp_path / "cache" / feature_generator.feature_fingerprint()).glob("*/*.npy"))
+    entry.write_bytes(entry.read_bytes()[:40])
+    (tmp_path / "out" / "feature_manifest.json").unlink()
+    run()
+    assert len(computed) == 8
+
+    # A new feature version evicts the old entries, but not unrelated directories
+    (tmp_path / "cache" / "unrelated").mkdir()
+    (tmp_path / "cache" / "unrelated" / "data.txt").write_text("keep")
+    monkeypatch.setitem(feature_generator.FEATURE_CONFIG, "version", -1)
+    run()
+    assert len(computed) == 11
+    assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == sorted(
+        [feature_generator.feature_fingerprint(), "unrelated"])
+    assert (tmp_path / "cache" / "unrelated" / "data.txt").read_text() == "keep"
+
+def test_extract_features_store_output(tmp_path):
+    rng = random.Random(6)
+    sequence_dir = write_sequence_dir(tmp_path, [random_sequence(rng, 45) for _ in range(3)])
+
+    feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "pt"))
+    feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "store"), output_format="store")
+    store = FeatureStore(str(tmp_path / "store"))
+    assert store.matrix.shape == (3, feature_generator.FEATURE_DIM)
+    for name in ["P0", "P1", "P2"]:
+        expected = np.array(torch.load(tmp_path / "pt" / f"{name}.pt"), dtype=np.float32)
+        assert (store.row(name) == expected).all()
+
+def test_read_fasta_and_extract_from_gzip_stream(tmp_path):
+    rng = random.Random(7)
+    sequences = [random_sequence(rng, 70) for _ in range(5)]
+    text = "".join(
+        f">sp|Q{i}|PROT{i}_HUMAN Protein {i}\n{s[:40]}\n{s[40:]}\n\n" for i, s in enumerate(sequences)
+    )
+    with gzip.open(tmp_path / "proteome.fasta.gz", "wt") as f:
+        f.write(text)
+
+    records = list(feature_extractor.read_fasta(str(tmp_path / "proteome.fasta.gz")))
+    assert records == [(f"Q{i}", s) for i, s in enumerate(sequences)]
+    assert list(feature_extractor.read_fasta(io.StringIO(">a desc\nMK\nLV\n>b\nAA"))) == [("a", "MKLV"), ("b", "AA")]
+
+    with open(tmp_path / "proteome.fasta.gz", "rb") as stream:
+        feature_generator.extract_features(stream, None, str(tmp_path / "store"), output_format="store", batch_size=2)
+    store = FeatureStore(str(tmp_path / "store"))
+    assert len(store) == 5
+    assert store.row("Q3").tolist() == np.array(feature_generator.protein_features(sequences[3], "Q3"), dtype=np.float32).tolist()
+
+def test_fetch_sequences_concurrent_with_disk_cache(tmp_path):
+    # Local stand-in for UniProt: serves two IDs, 404s others, fails P2 once with a 503
+    requests_seen = []
+    failed_once = set()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            uniprot_id = self.path.rsplit("/", 1)[-1].split(".")[0]
+            requests_seen.append(uniprot_id)
+            if uniprot_id == "P2" and uniprot_id not in failed_once:
+                failed_once.add(uniprot_id)
+                self.send_response(503)
+                self.end_headers()
+                return
+            if uniprot_id not in ("P1", "P2"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = f">sp|{uniprot_id}|TEST\nMKT\nAY{uniprot_id[-1]}\n".encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/uniprot"
+    try:
+        fetch = lambda: feature_extractor.fetch_sequences(
+            ["P1", "P2", "P9", "P1"], cache_dir=str(tmp_path), base_url=base_url, max_workers=4, backoff=0.01)
+        assert fetch() == {"P1": "MKTAY1", "P2": "MKTAY2", "P9": None}
+        assert sorted(requests_seen) == ["P1", "P2", "P2", "P9"]
+        assert fetch() == {"P1": "MKTAY1", "P2": "MKTAY2", "P9": None}
+        assert len(requests_seen) == 4  # second run served entirely from the cache
+    finally:
+        server.shutdown()
+
+def test_feature_set_selects_blocks(tmp_path):
+    sequence = random_sequence(random.Random(8), 60)
+    full = feature_generator.protein_features(sequence, "P0")
+    offsets = feature_generator.feature_block_offsets()
+    assert len(full) == feature_generator.FEATURE_DIM == 1164
+
+    subset = feature_generator.protein_features(sequence, "P0", feature_set={"apaac", "aac", "soc"})
+    expected = [v for block in ["aac", "soc_schneider", "soc_grantham", "apaac"] for v in full[slice(*offsets[block])]]
+    assert subset == expected
+
+    sequence_dir = write_sequence_dir(tmp_path, [sequence])
+    feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "store"),
+                                       output_format="store", feature_set={"aac", "ctd"})
+    store = FeatureStore(str(tmp_path / "store"))
+    assert store.blocks == {"aac": [0, 20], "ctd": [20, 524]}
+    assert store.matrix.shape == (1, 524)
+    assert FC(feature_set={"aac", "ctd"}).pro1_fc1.in_features == 524
+    assert FC().pro2_fc1.in_features == 1164
+    with pytest.raises(ValueError):
+        feature_generator.resolve_feature_set({"aac", "pssm"})
+
+def test_extract_features_profile_summary(tmp_path):
+    rng = random.Random(9)
+    sequence_dir = write_sequence_dir(tmp_path, [random_sequence(rng, length) for length in [40, 200, 90]])
+
+    feature_generator.extract_features(str(sequence_dir), None, str(tmp_path / "out"), workers=2,
+                                       profile_path=str(tmp_path / "profile.json"), profile_top_n=2)
+    summary = json.loads((tmp_path / "profile.json").read_text())
+    assert summary["sequences"] == 3 and summary["residues"] == 330
+    assert set(summary["stages"]) == set(feature_generator.FEATURE_BLOCKS)
+    assert len(summary["slowest"]) == 2
+    assert summary["slowest"][0]["seconds"] >= summary["slowest"][1]["seconds"]
+
+def test_benchmark_cross_check_and_timings():
+    rng = random.Random(0)
+    sequences = [benchmark.synthetic_sequence(length, rng) for length in benchmark.uniprot_like_lengths(5, rng)]
+    benchmark.cross_check(sequences + [benchmark.synthetic_sequence(31, rng)])
+
+    timings = benchmark.benchmark_sequence(sequences[0], per_property=False, min_seconds=0)
+    assert set(timings) >= {"AAC", "DPC", "CTD", "QSOrder", "SOCNumber", "APAAC", "pipeline", "CTD_reference"}
+    # Too short for the sequence-order descriptors: reported as NaN, not raised
+    short = benchmark.benchmark_sequence("ACDEF", per_property=False, reference=False, min_seconds=0)
+    assert np.isnan(short["QSOrder"]) and short["AAC"] > 0
+
+def test_raw_normalization_mode(tmp_path):
+    sequence = SEQUENCE * 4
+    per_vector = feature_generator.protein_features(sequence, "P1", feature_set={"soc", "apaac"})
+    raw = feature_generator.protein_features(sequence, "P1", feature_set={"soc", "apaac"}, normalization="none")
+    assert raw[:30] == per_vector[:30]
+    assert feature_generator.norm(raw[30:60]) == per_vector[30:60]
+    assert feature_generator.norm_(raw[60:]) == per_vector[60:]
+    assert feature_generator.feature_fingerprint(feature_generator.feature_config()) == \
+        feature_generator.feature_fingerprint(feature_generator.FEATURE_CONFIG)
+    assert feature_generator.feature_fingerprint(feature_generator.feature_config(normalization="none")) != \
+        feature_generator.feature_fingerprint(feature_generator.FEATURE_CONFIG)
+    # Constant vectors no longer divide by zero
+    assert feature_generator.norm([3.0, 3.0]) == [0.0, 0.0] and feature_generator.norm_([1.0]) == [0.0]
+    with pytest.raises(ValueError):
+        feature_generator.extract_features(str(tmp_path), None, str(tmp_path / "out"), normalization="zscore")
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the evaluation metrics.
+Run using: pytest test_metrics.py
+Author: Kiana Seraj
+"""
+
+import math
+import numpy as np
+import pytest
+import torch
+
+from metrics import MetricAccumulator, evaluate_metrics, get_accuracy, get_confusion_matrix
+
+
+def test_confusion_matrix_and_accuracy():
+    actual = np.array([[1], [0], [1], [0], [1]], dtype=float)  # column layout, as from a (N, 1) tensor
+    predicted = [0.9, 0.6, 0.2, 0.1, 0.5]
+    assert get_confusion_matrix(actual, predicted) == (2, 1, 1, 1)
+    assert get_accuracy(actual, predicted) == 3 / 5
+
+
+def test_accumulator_matches_evaluate_metrics():
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, 1000)
+    scores = np.clip(labels * 0.3 + rng.random(1000) * 0.7, 0, 1).astype(np.float32)
+    losses = rng.random(8)
+
+    # Capacity below the epoch size: the buffers grow
+    accumulator = MetricAccumulator(300)
+    for i, start in enumerate(range(0, 1000, 128)):
+        batch = slice(start, start + 128)
+        accumulator.update(torch.from_numpy(scores[batch]).view(-1, 1),
+                           torch.from_numpy(labels[batch]).float().view(-1, 1), torch.tensor(losses[i]))
+    metrics = accumulator.compute()
+
+    expected = evaluate_metrics(labels, scores)
+    assert metrics.keys() == expected.keys() | {"loss"}
+    assert all(metrics[k] == pytest.approx(expected[k]) for k in expected)
+    sizes = [len(range(start, min(start + 128, 1000))) for start in range(0, 1000, 128)]
+    assert math.isclose(metrics["loss"], np.dot(losses, sizes) / 1000)
+
+    accumulator.reset()
+    accumulator.update(torch.tensor([0.9, 0.1]), torch.tensor([1, 0]))
+    assert accumulator.compute()["accuracy"] == 1.0
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the FC model.
+Run using: pytest test_model.py
+Author: Kiana Seraj
+"""
+
+import pytest
+import torch
+
+from model import FC
+
+
+def _trained_like(model):
+    # Non-trivial BatchNorm statistics, as after training
+    torch.manual_seed(0)
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm1d):
+            module.running_mean.uniform_(-1, 1)
+            module.running_var.uniform_(0.5, 2)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-1, 1)
+    return model
+
+
+@pytest.mark.parametrize("shared_towers", [False, True])
+def test_stacked_towers_match_layer_by_layer(shared_towers):
+    model = _trained_like(FC(shared_towers=shared_towers)).eval()
+    x1, x2 = torch.rand(5, 1164), torch.rand(5, 1164)
+    with torch.no_grad():
+        stacked = model(x1, x2)
+        model.stacked = False
+        layered = model(x1, x2)
+    assert torch.allclose(stacked, layered, atol=1e-6)
+    assert ("pro2_fc1.weight" in model.state_dict()) != shared_towers
+
+
+def test_stacked_weights_follow_checkpoint_loading(tmp_path):
+    old = _trained_like(FC()).eval()
+    torch.save(old.state_dict(), tmp_path / "model.pt")
+
+    model = FC().eval()
+    x1, x2 = torch.rand(3, 1164), torch.rand(3, 1164)
+    with torch.no_grad():
+        before = model(x1, x2)
+        model.load_state_dict(torch.load(tmp_path / "model.pt"))
+        after = model(x1, x2)
+        model.stacked = False
+        assert torch.allclose(after, model(x1, x2), atol=1e-6)
+    assert not torch.allclose(before, after)
+
+    # In-place edits (weights and BatchNorm statistics) are picked up without invalidate()
+    model.stacked = True
+    with torch.no_grad():
+        model.pro1_fc1.weight.mul_(2)
+        edited = model(x1, x2)
+        assert not torch.allclose(edited, after)
+        model.pro2_bn1.running_var.mul_(2)
+        assert not torch.allclose(model(x1, x2), edited)
+        model.stacked = False
+        layered = model(x1, x2)
+        model.stacked = True
+        assert torch.allclose(model(x1, x2), layered, atol=1e-6)
+
+
+def test_eval_forward_with_grad_reaches_tower_parameters():
+    model = _trained_like(FC()).eval()
+    x1, x2 = torch.rand(3, 1164), torch.rand(3, 1164)
+    with torch.no_grad():
+        expected = model(x1, x2)
+    scores = model(x1, x2)
+    assert torch.allclose(scores, expected, atol=1e-6)
+    scores[:, -1].sum().backward()
+    assert model.pro1_fc1.weight.grad is not None and model.pro2_bn1.weight.grad is not None
+
+
+def test_symmetric_scoring_in_one_pass():
+    model = _trained_like(FC()).eval()
+    a, b = torch.rand(4, 1164), torch.rand(4, 1164)
+    with torch.no_grad():
+        expected = (model(a, b) + model(b, a)) / 2
+        assert torch.allclose(model(a, b, symmetric=True), expected, atol=1e-6)
+        assert torch.allclose(model(a, b, symmetric=True), model(b, a, symmetric=True), atol=1e-6)
+
+
+def test_training_mode_uses_batch_statistics():
+    model = FC(shared_towers=True).train()
+    out = model(torch.rand(8, 1164), torch.rand(8, 1164))
+    out.sum().backward()
+    assert out.shape == (8, 2) and model.pro1_fc1.weight.grad is not None
+
+
+def test_pair_scorer_caches_embeddings(tmp_path, monkeypatch):
+    from inference import PairScorer
+    torch.manual_seed(1)
+    vectors = {f"P{i}": torch.rand(1164) for i in range(6)}
+    model = _trained_like(FC()).eval()
+    scorer = PairScorer(model, lambda ids: torch.stack([vectors[p] for p in ids]).numpy(),
+                        cache_size=4, spill_dir=str(tmp_path), batch_size=3)
+
+    encoded = []
+    real_encode = model.encode
+    monkeypatch.setattr(model, "encode", lambda x, tower=1: encoded.append(len(x)) or real_encode(x, tower))
+
+    pairs = [("P0", "P1"), ("P0", "P2"), ("P3", "P0"), ("P4", "P5")]
+    with torch.no_grad():
+        expected = model(torch.stack([vectors[a] for a, _ in pairs]), torch.stack([vectors[b] for _, b in pairs]))[:, 1]
+        symmetric = model(torch.stack([vectors[a] for a, _ in pairs]), torch.stack([vectors[b] for _, b in pairs]),
+                          symmetric=True)[:, 1]
+    assert torch.allclose(scorer.score(pairs), expected, atol=1e-6)
+    n_encoded = sum(encoded)
+    assert n_encoded == 3 + 4  # unique proteins per tower: {P0, P3, P4} + {P1, P2, P0, P5}
+
+    # Evicted embeddings were spilled to disk and are read back instead of recomputed
+    assert len(scorer.cache) == 4
+    assert torch.allclose(scorer.score(pairs), expected, atol=1e-6)
+    assert sum(encoded) == n_encoded
+    assert torch.allclose(scorer.score(pairs, symmetric=True), symmetric, atol=1e-6)
+
+    # Re-extracted features are never answered from an earlier scorer's spill
+    vectors = {p: v + 1 for p, v in vectors.items()}
+    rescorer = PairScorer(model, lambda ids: torch.stack([vectors[p] for p in ids]).numpy(),
+                          cache_size=4, spill_dir=str(tmp_path), batch_size=3)
+    with torch.no_grad():
+        expected = model(torch.stack([vectors[a] for a, _ in pairs]), torch.stack([vectors[b] for _, b in pairs]))[:, 1]
+    assert torch.allclose(rescorer.score(pairs), expected, atol=1e-6)
+    assert torch.allclose(rescorer.score(pairs), expected, atol=1e-6)
+    del scorer, rescorer
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_screening_matches_brute_force(tmp_path, symmetric):
+    import numpy as np
+    from feature_store import FeatureStoreWriter
+    from screening import screen_proteome
+    torch.manual_seed(2)
+    features = torch.rand(11, 1164)
+    with FeatureStoreWriter(str(tmp_path / "store"), 1164) as writer:
+        for i, row in enumerate(features):
+            writer.add(row.numpy(), [f"P{i}"])
+    model = _trained_like(FC()).eval()
+    with torch.no_grad():
+        a, b = torch.triu_indices(11, 11, offset=1)
+        expected = model(features[a], features[b], symmetric=symmetric)[:, 1]
+    scores = {(f"P{i}", f"P{j}"): s for i, j, s in zip(a.tolist(), b.tolist(), expected.tolist())}
+    threshold = float(np.median(expected.numpy()))
+
+    # A tiny memory budget forces 3x3 tiles; the thread count is restored afterwards
+    threads = torch.get_num_threads()
+    summary = screen_proteome(model, str(tmp_path / "store"), str(tmp_path / "out"), top_k=3,
+                              threshold=threshold, memory_mb=0.02, symmetric=symmetric, threads=threads + 1)
+    assert torch.get_num_threads() == threads
+    assert summary == {"proteins": 11, "pairs": 55, "hits": sum(s >= threshold for s in scores.values())}
+
+    hits = [line.split("\t") for line in (tmp_path / "out" / "hits.tsv").read_text().splitlines()]
+    assert all(abs(float(s) - scores[(p, q)]) < 1e-5 for p, q, s in hits)
+
+    topk = [line.split("\t") for line in (tmp_path / "out" / "topk.tsv").read_text().splitlines()]
+    assert len(topk) == 33
+    for i in range(11):
+        partners = sorted(((s, q if p == f"P{i}" else p) for (p, q), s in scores.items() if f"P{i}" in (p, q)),
+                          reverse=True)[:3]
+        listed = [(float(s), q) for p, _, q, s in topk if p == f"P{i}"]
+        assert [q for _, q in listed] == [q for _, q in partners]
+        assert all(abs(x - y) < 1e-5 for (x, _), (y, _) in zip(listed, partners))
+
+
+@pytest.mark.parametrize("shared_towers", [False, True])
+def test_export_matches_eval_model(tmp_path, shared_towers):
+    import numpy as np
+    from export import export_model
+    from normalizer import FeatureNormalizer
+    normalizer = FeatureNormalizer(np.random.rand(1164), np.random.rand(1164) + 0.5)
+    model = _trained_like(FC(normalizer=normalizer, shared_towers=shared_towers)).train()
+    export_model(model, str(tmp_path / "model.ts"))
+    assert model.training and model.stacked  # the caller's model is left unchanged
+
+    model.eval()
+    loaded = torch.jit.load(str(tmp_path / "model.ts"))
+    x1, x2 = torch.rand(7, 1164), torch.rand(7, 1164)
+    with torch.no_grad():
+        assert torch.allclose(loaded(x1, x2), model(x1, x2), atol=1e-5)
+    graph = str(loaded.graph)
+    assert "batch_norm" not in graph and "dropout" not in graph
+
+
+def test_quantized_model_guardrails(tmp_path):
+    from quantization import quantize_model
+    model = _trained_like(FC()).train()
+    torch.manual_seed(3)
+    labels = torch.randint(0, 2, (256,))
+    x1, x2 = torch.rand(256, 1164) + labels[:, None], torch.rand(256, 1164) + labels[:, None]
+
+    quantized, report = quantize_model(model, x1, x2, labels.numpy(), str(tmp_path / "int8.pt"),
+                                       max_auroc_drop=1.0, max_mcc_drop=2.0, min_seconds=0.01)
+    assert model.training  # the caller's model is not switched to eval mode
+    assert report["int8_bytes"] < report["fp32_bytes"] / 3 and report["max_score_diff"] < 0.01
+    assert set(report["delta"]) == set(report["fp32"])
+    loaded = torch.jit.load(str(tmp_path / "int8.pt"))
+    with torch.no_grad():
+        assert torch.allclose(loaded(x1[:4], x2[:4]), quantized(x1[:4], x2[:4]))
+
+    # A negative tolerance can never be met: the export is refused and nothing is written
+    with pytest.raises(ValueError, match="auroc"):
+        quantize_model(model, x1, x2, labels.numpy(), str(tmp_path / "rejected.pt"),
+                       max_auroc_drop=-1.0, min_seconds=0.01)
+    assert not (tmp_path / "rejected.pt").exists()
+
+
+def test_single_logit_head_and_old_checkpoints(tmp_path):
+    from export import export_model
+    from inference import load_model, PairScorer
+    from model import to_single_logit
+    old = _trained_like(FC()).eval()
+    torch.save(old.state_dict(), tmp_path / "old.pt")
+    x1, x2 = torch.rand(6, 1164), torch.rand(6, 1164)
+    with torch.no_grad():
+        expected = old(x1, x2)[:, 1]
+        assert torch.allclose(torch.sigmoid(old.logits(x1, x2)), expected, atol=1e-6)
+
+        # Two-output checkpoints load as such, or convert to the single-logit layout
+        assert load_model(str(tmp_path / "old.pt")).out.out_features == 2
+        model = FC(single_logit=True)
+        model.load_state_dict(to_single_logit(torch.load(tmp_path / "old.pt")))
+        model.eval()
+        assert model(x1, x2).shape == (6, 1)
+        assert torch.allclose(model(x1, x2)[:, -1], expected, atol=1e-6)
+        torch.save(model.state_dict(), tmp_path / "new.pt")
+        assert load_model(str(tmp_path / "new.pt")).single_logit
+        assert torch.allclose(export_model(model)(x1, x2)[:, -1], expected, atol=1e-5)
+
+    vectors = {f"P{i}": v for i, v in enumerate(torch.cat((x1, x2)))}
+    scorer = PairScorer(model, lambda ids: torch.stack([vectors[p] for p in ids]).numpy())
+    assert torch.allclose(scorer.score([(f"P{i}", f"P{i + 6}") for i in range(6)]), expected, atol=1e-6)
+    bf16_scorer = PairScorer(model, scorer.features, bf16=True)
+    assert torch.allclose(bf16_scorer.score([(f"P{i}", f"P{i + 6}") for i in range(6)]), expected, atol=0.05)
+
+
+def test_single_logit_training_step_under_bf16_autocast():
+    model = FC(single_logit=True).train()
+    labels = torch.randint(0, 2, (8,)).float()
+    seen = []
+    model.out.register_forward_hook(lambda module, inputs, output: seen.append((inputs[0].dtype, output.dtype)))
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        logits = model.logits(torch.rand(8, 1164), torch.rand(8, 1164))
+    assert logits.shape == (8,) and seen == [(torch.float32, torch.float32)]  # output layer not rounded to bf16
+    torch.nn.BCEWithLogitsLoss()(logits, labels).backward()
+    assert model.out.weight.grad.shape == (1, 128) and model.pro1_fc1.weight.grad.dtype == torch.float32
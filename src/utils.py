@@ -6,17 +6,23 @@ Utility functions for computing protein sequence descriptors including:
 - Physicochemical property encodings
 - Sequence order and transition metrics
 - Quasi sequence order, pseudo amino acid composition
-- UniProt sequence fetching
+- Streaming multi-FASTA parsing and UniProt sequence fetching
 
 Author: Kiana Seraj
 """
 
 from constants import *
+import contextlib
+import gzip
+import io
 import math
+import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import protpy
 import requests
-from protFeat.feature_extracter import extract_protein_feature
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # =========================
 # Feature 1: Basic Composition Descriptors
@@ -24,7 +30,7 @@ from protFeat.feature_extracter import extract_protein_feature
 
 def AAC(sequence):
     """
-    Amino Acid Composition (AAC), 20 features.
+    Amino Acid Composition (AAC), 20 features (one-sequence `AAC_batch`).
 
     Args:
         sequence (str): Amino acid sequence.
@@ -32,13 +38,12 @@ def AAC(sequence):
     Returns:
         list: Normalized AAC features.
     """
-    amino_acid_composition = protpy.amino_acid_composition(sequence)
-    return [i / 100 for i in amino_acid_composition.values[0]]
+    return AAC_batch([sequence])[0].tolist()
 
 
 def DPC(sequence):
     """
-    Dipeptide Composition (DPC), 400 features.
+    Dipeptide Composition (DPC), 400 features (one-sequence `DPC_batch`).
 
     Args:
         sequence (str): Amino acid sequence.
@@ -46,8 +51,95 @@ def DPC(sequence):
     Returns:
         list: Normalized DPC features.
     """
-    dipeptide_composition = protpy.dipeptide_composition(sequence)
-    return [i / 100 for i in dipeptide_composition.values[0]]
+    return DPC_batch([sequence])[0].tolist()
+
+
+# Residue order of protpy's AAC columns (DPC columns are all pairs in this order)
+COMPOSITION_AA = "ACDEFGHIKLMNPQRSTVWY"
+
+_COMPOSITION_INDEX = np.full(256, 255, dtype=np.uint8)
+_COMPOSITION_INDEX[np.frombuffer(COMPOSITION_AA.encode(), dtype=np.uint8)] = np.arange(20)
+
+
+def _encode_batch(sequences, min_length=1):
+    """
+    Integer-encode a list of sequences into one concatenated residue array.
+
+    Returns:
+        tuple: (residue indices, sequence lengths, sequence id of every residue)
+    """
+    encoded = [sequence.upper().encode() for sequence in sequences]
+    lengths = np.array([len(e) for e in encoded], dtype=np.int64)
+    if (lengths < min_length).any():
+        raise ValueError(f"Sequences must have at least {min_length} residue(s)")
+    residues = _COMPOSITION_INDEX[np.frombuffer(b"".join(encoded), dtype=np.uint8)]
+    if (residues == 255).any():
+        raise ValueError("Sequences contain non-canonical amino acid characters")
+    seq_ids = np.repeat(np.arange(len(encoded)), lengths)
+    return residues, lengths, seq_ids
+
+
+def _round_like_python(values, ndigits):
+    """
+    Apply Python's round() (as protpy does) to every value, one call per distinct value.
+    """
+    uniq, inverse = np.unique(values, return_inverse=True)
+    rounded = np.array([round(v, ndigits) for v in uniq.tolist()])
+    return rounded[inverse].reshape(values.shape)
+
+
+def AAC_batch(sequences):
+    """
+    Amino Acid Composition for many sequences at once, identical to protpy's
+    `amino_acid_composition` / 100 per row.
+
+    Args:
+        sequences (list): Amino acid sequences.
+
+    Returns:
+        np.ndarray: (N, 20) float64 matrix of normalized AAC features.
+    """
+    residues, lengths, seq_ids = _encode_batch(sequences)
+    n = len(lengths)
+    counts = np.bincount(seq_ids * 20 + residues, minlength=n * 20).reshape(n, 20)
+    percent = _round_like_python(counts / lengths[:, None] * 100, 3)
+    return percent / 100
+
+
+def DPC_batch(sequences):
+    """
+    Dipeptide Composition for many sequences at once, identical to protpy's
+    `dipeptide_composition` / 100 per row.
+
+    Like protpy (`str.count`), runs of one residue count non-overlapping pairs only,
+    e.g. "AAA" holds a single "AA".
+
+    Args:
+        sequences (list): Amino acid sequences.
+
+    Returns:
+        np.ndarray: (N, 400) float64 matrix of normalized DPC features.
+    """
+    residues, lengths, seq_ids = _encode_batch(sequences, min_length=2)
+    n = len(lengths)
+    residues = residues.astype(np.int64)
+
+    same_seq = seq_ids[1:] == seq_ids[:-1]
+    pairs = (seq_ids[:-1] * 400 + residues[:-1] * 20 + residues[1:])[same_seq]
+    counts = np.bincount(pairs, minlength=n * 400)
+
+    # A run of r identical residues has r - 1 overlapping but only r // 2 non-overlapping pairs
+    run_starts = np.flatnonzero(np.concatenate(([True], (residues[1:] != residues[:-1]) | ~same_seq)))
+    run_lengths = np.diff(np.append(run_starts, len(residues)))
+    excess = run_lengths - 1 - run_lengths // 2
+    runs = excess > 0
+    counts -= np.bincount(
+        seq_ids[run_starts[runs]] * 400 + residues[run_starts[runs]] * 21,
+        weights=excess[runs], minlength=n * 400
+    ).astype(np.int64)
+
+    percent = _round_like_python(counts.reshape(n, 400) / (lengths - 1)[:, None] * 100, 2)
+    return percent / 100
 
 
 def APAAC(sequence):
@@ -96,6 +188,34 @@ hydrogen_bond_acceptor_descriptor = lambda seq: _property_descriptor(seq, hydrog
 water_Solubility_descriptor = lambda seq: _property_descriptor(seq, water_Solubility)
 Amino_acid_flexibility_descriptor = lambda seq: _property_descriptor(seq, Amino_acid_flexibility)
 
+# Same order as `physiochemical_classes` in constants.py
+physiochemical_properties = [
+    hydrophobicity_descriptor,
+    Normalized_van_der_waals_vol_descriptor,
+    polarity_descriptor,
+    polarizability_descriptor,
+    charge_descriptor,
+    secondary_structure_descriptor,
+    solvent_accessible_descriptor,
+    surface_tension_descriptor,
+    prot_prot_hotspot_descriptor,
+    prot_prot_propensity_descriptor,
+    prot_dna_propensity_Schneider_descriptor,
+    prot_dna_propensity_Ahmad_descriptor,
+    prot_RNA_propensity_Kim_descriptor,
+    prot_RNA_propensity_Ellis_descriptor,
+    prot_RNA_propensity_Phipps_descriptor,
+    prot_ligand_propensity_descriptor,
+    prot_ligand_valid_propensity_descriptor,
+    prot_ligand_polar_propensity_descriptor,
+    molecular_weight_descriptor,
+    cLogP_descriptor,
+    hydrogen_bond_donor_descriptor,
+    hydrogen_bond_acceptor_descriptor,
+    water_Solubility_descriptor,
+    Amino_acid_flexibility_descriptor
+]
+
 
 # =========================
 # Feature 3: CTD Encoding (Composition, Transition, Distribution)
@@ -124,21 +244,29 @@ def transition_descriptor(encoding):
     Returns:
         list: Transition frequencies (length 3).
     """
-    transitions_ = {}
-    transitions = ["12", "13", "21", "23", "31", "32"]
-    for i in range(len(encoding) - 1):
-        transition = encoding[i:i+2]
-        if transition in transitions:
-            transitions_[transition] = transitions_.get(transition, 0) + 1
+    # A pair of distinct characters cannot overlap itself, so str.count equals the
+    # number of sliding windows and the whole descriptor takes six C-level scans
+    denom = len(encoding) - 1 if len(encoding) > 1 else 1
+    return [
+        (encoding.count("12") + encoding.count("21"))/denom,
+        (encoding.count("13") + encoding.count("31"))/denom,
+        (encoding.count("23") + encoding.count("32"))/denom
+    ]
 
-    combined = {"12": 0, "13": 0, "23": 0}
-    for t, count in transitions_.items():
-        if t in ["12", "21"]: combined["12"] += count
-        elif t in ["13", "31"]: combined["13"] += count
-        else: combined["23"] += count
 
-    denom = len(encoding) - 1 if len(encoding) > 1 else 1
-    return [combined["12"]/denom, combined["13"]/denom, combined["23"]/denom]
+def _class_quartile_positions(positions, n):
+    """
+    1-based positions of the first, 25%, 50%, 75% and last of `n` class occurrences.
+    """
+    if not n:
+        return [0] * 5
+    return [
+        int(positions[0])+1,
+        int(positions[min(math.ceil(n*0.25)-1, n-1)])+1,
+        int(positions[min(math.ceil(n*0.50)-1, n-1)])+1,
+        int(positions[min(math.ceil(n*0.75)-1, n-1)])+1,
+        int(positions[n-1])+1
+    ]
 
 
 def calculate_class_lengths(encoding, target_class):
@@ -147,37 +275,154 @@ def calculate_class_lengths(encoding, target_class):
 
     Returns the position (1-based) of the first, 25%, 50%, 75%, and 100% occurrence of a class.
     """
-    positions = [i for i, char in enumerate(encoding) if char == target_class]
-    if not positions:
-        return [0] * 5
-
-    n = len(positions)
-    return [
-        positions[0]+1,
-        positions[min(math.ceil(n*0.25)-1, n-1)]+1,
-        positions[min(math.ceil(n*0.50)-1, n-1)]+1,
-        positions[min(math.ceil(n*0.75)-1, n-1)]+1,
-        positions[-1]+1
-    ]
+    residues = np.frombuffer(encoding.encode(), dtype=np.uint8)
+    positions = np.flatnonzero(residues == ord(target_class))
+    return _class_quartile_positions(positions, len(positions))
 
 
 def distribution_descriptor(encoding):
     """
     Distribution descriptor: relative positions of key percentiles for each class.
 
+    The encoding is scanned once into a byte array; class positions are located with
+    NumPy rather than materialized as Python lists, so very long sequences stay linear
+    in time and allocate no per-residue Python objects.
+
     Args:
         encoding (str): Encoded string.
 
     Returns:
         list: 15 distribution features.
     """
+    residues = np.frombuffer(encoding.encode(), dtype=np.uint8)
     features = []
-    for c in ["1", "2", "3"]:
-        raw = calculate_class_lengths(encoding, c)
+    for c in b"123":
+        positions = np.flatnonzero(residues == c)
+        raw = _class_quartile_positions(positions, len(positions))
         features.extend([r / len(encoding) for r in raw])
     return features
 
 
+# =========================
+# Feature 3b: Vectorized CTD Engine (all 24 properties at once)
+# =========================
+
+def _build_ctd_lookup(class_dicts):
+    """
+    Build a (n_properties, 256, depth) uint8 table mapping a residue byte to its
+    class codes for every property. 0 means "no class".
+
+    `depth` is the largest number of classes one residue is listed in for a single
+    property (e.g. 'P' appears in both "2" and "3" of `solvent_accessible`), so the
+    table reproduces `_property_descriptor` exactly, including its quirks.
+    """
+    depth = max(
+        sum(aa in val for val in prop_dict.values())
+        for prop_dict in class_dicts
+        for aa in "".join(prop_dict.values())
+    )
+    table = np.zeros((len(class_dicts), 256, depth), dtype=np.uint8)
+    for p, prop_dict in enumerate(class_dicts):
+        for aa in set("".join(prop_dict.values())):
+            codes = [int(key) for key, val in prop_dict.items() if aa in val]
+            table[p, ord(aa), :len(codes)] = codes
+    return table
+
+
+CTD_LOOKUP = _build_ctd_lookup(physiochemical_classes)
+
+# Properties whose rows cannot be taken from the first table slot alone
+_CTD_MULTICLASS = np.flatnonzero(CTD_LOOKUP[:, :, 1:].any(axis=(1, 2)))
+
+
+def encode_property_classes(sequence):
+    """
+    Encode a sequence into class codes for all physicochemical properties with one gather.
+
+    Args:
+        sequence (str): Amino acid sequence.
+
+    Returns:
+        tuple: (codes, lengths). `codes` is a (24, M) uint8 matrix whose row p holds the
+        classes of `physiochemical_properties[p](sequence)` left-aligned and zero-padded;
+        `lengths` holds the number of valid codes per row.
+    """
+    residues = np.frombuffer(sequence.encode(), dtype=np.uint8)
+    codes = CTD_LOOKUP[:, residues, 0]
+
+    # Rows with unclassified or multi-class residues are rebuilt from the full table
+    irregular = set(_CTD_MULTICLASS.tolist()) | set(np.flatnonzero(~codes.all(axis=1)).tolist())
+    if not irregular:
+        return codes, np.full(codes.shape[0], codes.shape[1])
+
+    rows = {}
+    for p in irregular:
+        row = CTD_LOOKUP[p, residues].ravel()
+        rows[p] = row[row != 0]
+    lengths = np.array([len(rows[p]) if p in rows else codes.shape[1] for p in range(codes.shape[0])])
+    width = max(int(lengths.max()), 1)
+    if width > codes.shape[1]:
+        codes = np.pad(codes, ((0, 0), (0, width - codes.shape[1])))
+    else:
+        codes = codes[:, :width].copy()
+    for p, row in rows.items():
+        codes[p, :len(row)] = row
+        codes[p, len(row):] = 0
+    return codes, lengths
+
+
+def ctd_descriptor(sequence):
+    """
+    CTD (Composition, Transition, Distribution) for all 24 physicochemical properties.
+
+    Vectorized equivalent of running `composition_descriptor`, `distribution_descriptor`
+    and `transition_descriptor` on every `physiochemical_properties` encoding; the
+    output is identical value for value.
+
+    Args:
+        sequence (str): Amino acid sequence.
+
+    Returns:
+        list: 504-length CTD vector (21 features per property).
+    """
+    codes, lengths = encode_property_classes(sequence)
+    if not lengths.all():
+        raise ZeroDivisionError("Sequence has no residue classified by every CTD property")
+    n_props, width = codes.shape
+
+    # Composition
+    counts = np.stack([(codes == c).sum(axis=1) for c in (1, 2, 3)], axis=1)
+    composition = counts / lengths[:, None]
+
+    # Transition: a pair of distinct classes a, b is identified by a + b (3: 1-2, 4: 1-3, 5: 2-3)
+    first, second = codes[:, :-1], codes[:, 1:]
+    pair = np.where((first != second) & (second != 0), first + second, 0)
+    transitions = np.stack([(pair == s).sum(axis=1) for s in (3, 4, 5)], axis=1)
+    transition = transitions / np.maximum(lengths - 1, 1)[:, None]
+
+    # Distribution: positions of the first, 25%, 50%, 75% and last occurrence of each class
+    distribution = np.zeros((n_props, 3, 5), dtype=np.int64)
+    row_offsets = np.arange(n_props) * width
+    for c in range(3):
+        n = counts[:, c]
+        positions = np.flatnonzero(codes == c + 1)
+        starts = np.cumsum(n) - n
+        idx = np.stack([
+            np.zeros_like(n),
+            np.minimum(np.ceil(n * 0.25).astype(np.int64) - 1, n - 1),
+            np.minimum(np.ceil(n * 0.50).astype(np.int64) - 1, n - 1),
+            np.minimum(np.ceil(n * 0.75).astype(np.int64) - 1, n - 1),
+            n - 1,
+        ], axis=1)
+        present = n > 0
+        distribution[present, c] = (
+            positions[starts[present, None] + idx[present]] - row_offsets[present, None] + 1
+        )
+    distribution = distribution.reshape(n_props, 15) / lengths[:, None]
+
+    return np.concatenate([composition, distribution, transition], axis=1).ravel().tolist()
+
+
 # =========================
 # Feature 4: Sequence Order
 # =========================
@@ -193,6 +438,7 @@ def QSOD(input_folder, fasta_file_name):
     Returns:
         list: QSOD features.
     """
+    from protFeat.feature_extracter import extract_protein_feature
     return extract_protein_feature("QSOrder", input_folder, fasta_file_name, place_protein_id=0)
 
 
@@ -207,24 +453,169 @@ def SOCD(input_folder, fasta_file_name):
     Returns:
         list: SOCD features.
     """
+    from protFeat.feature_extracter import extract_protein_feature
     return extract_protein_feature("SOCNumber", input_folder, fasta_file_name, place_protein_id=0)
 
 
+# In-process equivalents of the protFeat (iFeature) QSOrder / SOCNumber outputs.
+# Residue order of the composition part of QSOrder, as written by protFeat
+SEQUENCE_ORDER_AA = "ARNDCQEGHILKMFPSTWYV"
+
+
+def _dense_distance_matrices():
+    """
+    Stack the Schneider-Wrede and Grantham tables into a (2, 21, 21) array of squared
+    distances indexed by `SEQUENCE_ORDER_AA`; index 20 is a zero-distance padding residue.
+    """
+    matrices = np.zeros((2, 21, 21))
+    for i, a in enumerate(SEQUENCE_ORDER_AA):
+        for j, b in enumerate(SEQUENCE_ORDER_AA):
+            matrices[0, i, j] = schneider_wrede_distances[a][schneider_wrede_order.index(b)]
+            if a != b:
+                matrices[1, i, j] = grantham_distances[tuple(sorted((a, b)))]
+    return matrices ** 2
+
+
+SEQUENCE_ORDER_DISTANCES = _dense_distance_matrices()
+
+_SEQUENCE_ORDER_INDEX = np.full(256, 255, dtype=np.uint8)
+_SEQUENCE_ORDER_INDEX[np.frombuffer(SEQUENCE_ORDER_AA.encode(), dtype=np.uint8)] = np.arange(20)
+
+
+def sequence_order_coupling(sequence, nlag=30):
+    """
+    Sum of squared Schneider-Wrede and Grantham distances for every lag 1..nlag.
+
+    Args:
+        sequence (str): Amino acid sequence (20 standard residues only).
+        nlag (int): Maximum lag.
+
+    Returns:
+        np.ndarray: (2, nlag) array, row 0 Schneider-Wrede, row 1 Grantham.
+    """
+    if len(sequence) <= nlag:
+        raise ValueError(f"Sequence must be longer than nlag={nlag} residues (got {len(sequence)})")
+    idx = _SEQUENCE_ORDER_INDEX[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+    if (idx == 255).any():
+        raise ValueError(f"Non-standard residue in sequence: {sorted(set(sequence) - set(SEQUENCE_ORDER_AA))}")
+
+    # Pad with the zero-distance residue so all lags can be gathered as one (nlag, L) block
+    padded = np.concatenate([idx, np.full(nlag, 20, dtype=np.uint8)])
+    shifted = padded[np.arange(1, nlag + 1)[:, None] + np.arange(len(idx))]
+    return SEQUENCE_ORDER_DISTANCES[:, idx[None, :], shifted].sum(axis=2)
+
+
+def quasi_sequence_order(sequence, nlag=30, weight=0.1):
+    """
+    Quasi Sequence Order descriptor (QSOrder), 20 * 2 + nlag * 2 dimensions.
+
+    Same layout as the protFeat QSOrder output: Schneider Xr, Grantham Xr,
+    Schneider Xd, Grantham Xd.
+
+    Args:
+        sequence (str): Amino acid sequence.
+        nlag (int): Maximum lag.
+        weight (float): Weighting factor of the sequence-order terms.
+
+    Returns:
+        list: QSOrder features.
+    """
+    tau = sequence_order_coupling(sequence, nlag)
+    idx = _SEQUENCE_ORDER_INDEX[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+    counts = np.bincount(idx, minlength=20)
+    denom = 1 + weight * tau.sum(axis=1)
+    xr = counts[None, :] / denom[:, None]
+    xd = weight * tau / denom[:, None]
+    return np.concatenate([xr.ravel(), xd.ravel()]).tolist()
+
+
+def sequence_order_coupling_number(sequence, nlag=30):
+    """
+    Sequence Order Coupling Number (SOCNumber), nlag * 2 dimensions.
+
+    Same layout as the protFeat SOCNumber output: Schneider lags, then Grantham lags.
+
+    Args:
+        sequence (str): Amino acid sequence.
+        nlag (int): Maximum lag.
+
+    Returns:
+        list: SOCNumber features.
+    """
+    tau = sequence_order_coupling(sequence, nlag)
+    return (tau / (len(sequence) - np.arange(1, nlag + 1))).ravel().tolist()
+
+
+# =========================
+# Extra: Streaming Sequences from (gzip) Multi-FASTA
+# =========================
+
+def fasta_id(header):
+    """
+    Protein ID of a FASTA header: the accession of UniProt headers ("sp|P12345|NAME_HUMAN ...")
+    or the first word otherwise.
+    """
+    name = header.split()[0] if header.split() else ""
+    parts = name.split("|")
+    return parts[1] if len(parts) >= 3 and parts[0] in ("sp", "tr") else name
+
+
+def read_fasta(source):
+    """
+    Lazily parse a multi-FASTA file or stream, one record at a time.
+
+    Args:
+        source (str or file): Path to a FASTA file, or an open text/binary stream.
+            Gzip-compressed input is detected from its magic bytes.
+
+    Yields:
+        tuple: (protein ID, sequence)
+    """
+    with contextlib.ExitStack() as stack:
+        if isinstance(source, (str, os.PathLike)):
+            source = stack.enter_context(open(source, "rb"))
+        if not isinstance(source, io.TextIOBase):
+            if not hasattr(source, "peek"):
+                source = io.BufferedReader(source)
+            if source.peek(2)[:2] == b"\x1f\x8b":
+                source = stack.enter_context(gzip.GzipFile(fileobj=source))
+
+        protname, chunks = None, []
+        for line in source:
+            if isinstance(line, bytes):
+                line = line.decode()
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(">"):
+                if protname is not None:
+                    yield protname, "".join(chunks)
+                protname, chunks = fasta_id(line[1:]), []
+            else:
+                chunks.append(line)
+        if protname is not None:
+            yield protname, "".join(chunks)
+
+
 # =========================
 # Extra: Fetching Sequences from UniProt
 # =========================
 
-def fetch_sequence(uniprot_id):
+UNIPROT_URL = "https://www.uniprot.org/uniprot"
+
+
+def fetch_sequence(uniprot_id, base_url=UNIPROT_URL):
     """
     Fetch a protein sequence from UniProt using its UniProt ID.
 
     Args:
         uniprot_id (str): e.g., 'P12345'
+        base_url (str): URL serving `<base_url>/<uniprot_id>.fasta`.
 
     Returns:
         str or None: Protein sequence if found, else None.
     """
-    url = f"https://www.uniprot.org/uniprot/{uniprot_id}.fasta"
+    url = f"{base_url}/{uniprot_id}.fasta"
     response = requests.get(url)
     if response.status_code == 200:
         lines = response.text.split('\n')
@@ -234,6 +625,85 @@ def fetch_sequence(uniprot_id):
         return None
 
 
+def _uniprot_session(max_workers, retries, backoff):
+    """
+    HTTP session with a connection pool sized for `max_workers` threads and
+    exponential-backoff retries on connection errors, 429 and 5xx responses.
+    """
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_sequences(uniprot_ids, cache_dir=None, base_url=UNIPROT_URL, max_workers=16,
+                    retries=5, backoff=0.5, timeout=30):
+    """
+    Fetch many protein sequences from UniProt concurrently.
+
+    Requests share one pooled session and run on at most `max_workers` threads.
+    With `cache_dir`, every sequence found (and every ID answered with 404/410) is
+    stored on disk, so repeated runs make no requests for those IDs.
+
+    Args:
+        uniprot_ids (list): UniProt IDs.
+        cache_dir (str or None): Directory of the on-disk sequence cache.
+        base_url (str): URL serving `<base_url>/<uniprot_id>.fasta`.
+        max_workers (int): Maximum number of concurrent requests.
+        retries (int): Maximum number of retries per request.
+        backoff (float): Backoff factor between retries (seconds, doubled each retry).
+        timeout (float): Timeout of a single request (seconds).
+
+    Returns:
+        dict: UniProt ID -> sequence, or None if it could not be fetched.
+    """
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(uniprot_id, missing=False):
+        return os.path.join(cache_dir, f"{uniprot_id}.missing" if missing else f"{uniprot_id}.fasta")
+
+    results = {}
+    to_fetch = []
+    for uniprot_id in dict.fromkeys(uniprot_ids):
+        if cache_dir is not None and os.path.exists(cache_path(uniprot_id)):
+            results[uniprot_id] = next(read_fasta(cache_path(uniprot_id)))[1]
+        elif cache_dir is not None and os.path.exists(cache_path(uniprot_id, missing=True)):
+            results[uniprot_id] = None
+        else:
+            to_fetch.append(uniprot_id)
+
+    session = _uniprot_session(max_workers, retries, backoff)
+
+    def fetch(uniprot_id):
+        try:
+            response = session.get(f"{base_url}/{uniprot_id}.fasta", timeout=timeout)
+        except requests.RequestException as e:
+            print(f"[Error] Failed to fetch sequence for UniProt ID: {uniprot_id} ({e})")
+            return None
+        if response.status_code == 200:
+            records = list(read_fasta(io.StringIO(response.text)))
+            sequence = records[0][1] if records else None
+            if cache_dir is not None and sequence is not None:
+                # Write then rename, so an interrupted run never leaves a partial entry
+                tmp_path = cache_path(uniprot_id) + ".tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(response.text)
+                os.replace(tmp_path, cache_path(uniprot_id))
+            return sequence
+        if response.status_code in (404, 410) and cache_dir is not None:
+            open(cache_path(uniprot_id, missing=True), "w").close()
+        print(f"[Error] Failed to fetch sequence for UniProt ID: {uniprot_id} (HTTP {response.status_code})")
+        return None
+
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results.update(zip(to_fetch, executor.map(fetch, to_fetch)))
+    return {uniprot_id: results[uniprot_id] for uniprot_id in uniprot_ids}
+
+
 # Example usage (can be moved to a separate script or __main__ guard)
 if __name__ == "__main__":
     example_id = "P12345"